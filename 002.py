@@ -82,7 +82,8 @@ class Inc_para_set(QWidget, ui_load.Ui_Form):
         self.hide()
         
     def sub_load(self, data1, set_start1, change_azimuth1, set_info1, inner_pts1):
-        self.well = wp.load(data=data1, set_start=set_start1, change_azimuth=change_azimuth1, set_info=set_info1, inner_points=inner_pts1)
+        self.well = wp.load(data=data1, set_start=set_start1, change_azimuth=change_azimuth1, set_info=set_info1, inner_points=inner_pts1,
+                            cache_dir=True)  # 未改变的文件直接读取缓存
         if self.lineEdit_2.text() == '':
             self.well_name = None
         else:
@@ -123,26 +123,14 @@ class Well_diameter:
         self.z = np.zeros(self.x.shape)
     
     def get_env(self):
-        E = []
-        N = []
-        V = []
-        delta_E = []
-        delta_N = []
-        delta_V = []
-        for i in self.md_:
-            point = self.well.get_any_point(i)
-            E.append(point['east'])
-            N.append(point['north'])
-            V.append(point['tvd'])
-            delta_E.append(point['delta']['east'])
-            delta_N.append(point['delta']['north'])
-            delta_V.append(point['delta']['tvd'])
-        self.E = E
-        self.N = N
-        self.V = V
-        self.delta_E = delta_E
-        self.delta_N = delta_N
-        self.delta_V = delta_V
+        idx = self.well.insert_points(self.md_)  # 一次插入全部井深点
+        trajectory = self.well.trajectory
+        self.E = trajectory['east'][idx]
+        self.N = trajectory['north'][idx]
+        self.V = trajectory['tvd'][idx]
+        self.delta_E = trajectory.delta('east')[idx]
+        self.delta_N = trajectory.delta('north')[idx]
+        self.delta_V = trajectory.delta('tvd')[idx]
     
     def cal_rot_axi_ang(self):
         vec1 = np.array([0, 0, 1])
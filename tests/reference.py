@@ -0,0 +1,45 @@
+"""
+测试用的参照：原有的逐点标量算法（equations中的公式），与向量化的结果对比
+"""
+from math import degrees
+import numpy as np
+import pandas as pd
+from wellbore_trajectories.equations import calc_dogleg, calc_north, calc_east, calc_tvd, inner_pt_calcs
+
+
+def survey_frame(step=30.0, bottom=3000.0):
+    """
+    三维测斜数据：直井段后井斜角持续增加、方位角持续右转（不跨过0/360°，相邻测点井斜角都不相同，
+    旧的逐点插值在这样的测段上与圆弧插值一致）
+    """
+    md = np.arange(step, bottom + step / 2, step)
+    inc = np.where(md < 300, 0.0, 5 + (md - 300) / 40)
+    azi = np.where(md < 300, 0.0, 30 + md / 50)
+    return pd.DataFrame({'md': md, 'inc': inc, 'azi': azi})
+
+
+def scalar_survey(md, inc, azi):
+    """
+    逐测点用标量公式计算轨迹（原load的算法），第一个测点为井口点
+    :return: 字典，各列为数组
+    """
+    rows = [{'md': 0.0, 'inc': 0.0, 'azi': 0.0, 'tvd': 0.0, 'north': 0.0, 'east': 0.0, 'dl': 0.0}]
+    for m, i, a in zip(md, inc, azi):
+        p = rows[-1]
+        dogleg = calc_dogleg(p['inc'], i, p['azi'], a)
+        rows.append({'md': m, 'inc': i, 'azi': a, 'dl': degrees(dogleg),
+                     'north': calc_north(p['north'], p['md'], m, p['inc'], i, p['azi'], a, dogleg),
+                     'east': calc_east(p['east'], p['md'], m, p['inc'], i, p['azi'], a, dogleg),
+                     'tvd': calc_tvd(p['tvd'], p['md'], m, p['inc'], i, dogleg)})
+    return {key: np.array([row[key] for row in rows]) for key in rows[0]}
+
+
+def scalar_point(columns, md):
+    """
+    旧interp_pt的算法：狗腿角按井深比例分配，用inner_pt_calcs求测段内一点
+    """
+    idx = int(np.searchsorted(columns['md'], md))
+    p1, p2 = ({key: float(values[k]) for key, values in columns.items()} for k in (idx - 1, idx))
+    dl = (md - p1['md']) * p2['dl'] / (p2['md'] - p1['md'])
+    p2['sectionType'] = 'hold'
+    return inner_pt_calcs({'md': md, 'dl': dl}, p1, p2)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import wellbore_trajectories as wp
+from torque_and_drag.architecture import WellBore, BHA
+from torque_and_drag.torque_drag import TorqueDrag
+from torque_and_drag.shared import SharedString
+from reference import survey_frame
+
+
+@pytest.fixture
+def model():
+    well = wp.load(survey_frame())
+    wellbore = WellBore('wb', 0, 3000, method='top_down')
+    wellbore.add_section(id=0.3, bottom=1000, coeff_friction_sliding=0.25, name='casing')
+    wellbore.add_section(id=0.27, bottom=2200, coeff_friction_sliding=0.28, name='liner')
+    wellbore.add_section(id=0.25, bottom=3000, coeff_friction_sliding=0.3, name='open')
+    bha = BHA('bha', 0, 2900)
+    bha.add_section(od=0.15, id=0.1, unit_weight=400, length=300, name='hw', tooljoint_od=0.17)
+    bha.add_section(od=0.14, id=0.1, unit_weight=350, length=500, name='hw2')
+    bha.add_section(od=0.127, id=0.1, unit_weight=300, name='dp', tooljoint_od=0.16)
+    return well, wellbore, bha
+
+
+def loop_sections(sections, md, bottom):
+    """
+    原来的逐节点查找：段序号只增不减，找到top < md <= bottom的段
+    """
+    section, result = 0, []
+    for i in md[1:]:
+        if i > bottom:
+            break
+        while not sections[section]['top'] < i <= sections[section]['bottom']:
+            section += 1
+        result.append(section)
+    return np.array(result, dtype=np.int64)
+
+
+# 按二分查找分配分段，与原来的逐节点循环结果相同
+def test_section_mapping_matches_loop(model):
+    well, wellbore, bha = model
+    td = TorqueDrag(well, wellbore, bha, fluid_density=1.2, v=1, n=60)
+    md, delta_md = td.md, td.delta_md
+
+    string = loop_sections(bha.sections, md, bha.bottom)
+    unit = np.array([bha.sections[k]['unit_weight'] * bha.sections[k]['buoyancy_factor'] for k in string])
+    od = np.array([td.get_characteristic_od(k) for k in string])
+    np.testing.assert_array_equal(td.weight_buoyed_line, np.r_[0, unit])
+    np.testing.assert_array_equal(td.radius, np.r_[td.get_characteristic_od(0), od] / 2)
+    assert td.weight_buoyed[1:] == pytest.approx(unit * delta_md[1:len(string) + 1])
+
+    hole = loop_sections(wellbore.sections, md, wellbore.bottom)
+    friction = np.r_[0.25, [wellbore.sections[k]['coeff_friction_sliding'] for k in hole]]
+    np.testing.assert_array_equal(td.coeff_friction_sliding, friction)
+    speed = td.radius[0] * np.pi * 60 * td.radius[0] / 30
+    np.testing.assert_allclose(td.coeff_friction_sliding_d, 1 / np.hypot(1, speed) * friction)
+    np.testing.assert_allclose(td.coeff_friction_sliding_t ** 2 + td.coeff_friction_sliding_d ** 2, friction ** 2)
+
+
+# 共享内存中的管串与原管串相同，计算结果不变
+def test_shared_string(model):
+    well, wellbore, bha = model
+    shared = SharedString(bha)
+    try:
+        attached = shared.attach()
+        assert type(attached) is BHA
+        assert attached.sections == bha.sections
+        expected = TorqueDrag(well, wellbore, bha, fluid_density=1.2, v=1, n=60)
+        result = TorqueDrag(well, wellbore, attached, fluid_density=1.2, v=1, n=60)
+        np.testing.assert_array_equal(result.tension['pickup'], expected.tension['pickup'])
+        attached.shared_memory.close()
+    finally:
+        shared.close()
+        shared.unlink()
@@ -0,0 +1,457 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import wellbore_trajectories as wp
+from wellbore_trajectories.trajectory import Trajectory, FLOAT_COLUMNS
+from wellbore_trajectories.well import FrozenWell
+from wellbore_trajectories.field import FieldStore
+from wellbore_trajectories.shared import SharedWell
+from wellbore_trajectories.load_trajectory import trusted_survey
+from wellbore_trajectories.min_curvature import segment_table
+from wellbore_trajectories.anticollision import closest_approach
+from wellbore_trajectories.formations import formation_crossings
+from wellbore_trajectories.geo import to_geographic, field_coordinates
+from wellbore_trajectories.qc import survey_flags, FLAGS
+from wellbore_trajectories.analytics import dls_analytics
+from reference import survey_frame, scalar_survey, scalar_point
+
+
+COLUMNS = ('md', 'inc', 'azi', 'tvd', 'north', 'east', 'dl')
+
+
+@pytest.fixture
+def frame():
+    return survey_frame()
+
+
+@pytest.fixture
+def well(frame):
+    return wp.load(frame.copy())
+
+
+@pytest.fixture
+def scalar(frame):
+    return scalar_survey(frame['md'], frame['inc'], frame['azi'])
+
+
+def assert_columns(trajectory, expected, keys=COLUMNS, atol=1e-8):
+    for key in keys:
+        np.testing.assert_allclose(trajectory[key], expected[key], atol=atol, err_msg=key)
+
+
+def coordinate_frame(well):
+    """
+    带已有坐标的测斜数据（去掉井口点）
+    """
+    t = well.trajectory
+    return pd.DataFrame({key: t[key][1:] for key in ('md', 'inc', 'azi', 'tvd', 'north', 'east')})
+
+
+# 列式存储：测点视图与列一致，由记录重建得到相同的列
+def test_columnar_trajectory_round_trip(well):
+    t = well.trajectory
+    records = [dict(station) for station in t]
+    assert records[10]['md'] == t['md'][10]
+    rebuilt = Trajectory.from_records(records, dls_resolution=t.dls_resolution)
+    assert_columns(rebuilt, t, keys=FLOAT_COLUMNS, atol=0)
+    assert list(rebuilt['sectionType']) == list(t['sectionType'])
+
+
+# 向量化的最小曲率法与逐点标量公式一致
+def test_load_matches_scalar_survey(well, scalar):
+    assert_columns(well.trajectory, scalar)
+
+
+# 加密的插值点与旧的逐点插值一致
+def test_inner_points_match_scalar_interpolation(frame, scalar):
+    dense = wp.load(frame.copy(), inner_points=3).trajectory
+    assert len(dense) == 1 + 4 * len(frame)
+    inner = dense['pointType'] == 'interpolated'
+    for idx in np.flatnonzero(inner)[::7]:
+        expected = scalar_point(scalar, dense['md'][idx])
+        for key in ('inc', 'azi', 'tvd', 'north', 'east'):
+            assert dense[key][idx] == pytest.approx(expected[key], abs=1e-8)
+    assert dense['dl'].sum() == pytest.approx(scalar['dl'].sum())
+
+
+# 按井深网格加密：不保留测点时，落在网格上的测点仍保留，测段狗腿角为相邻点切向的夹角
+def test_resample_grid(well):
+    dense = well.resample(step=45.0).trajectory
+    np.testing.assert_array_equal(dense['md'], np.union1d(np.arange(0, 3000, 45.0), well.trajectory['md']))
+    np.testing.assert_allclose(np.cumsum(dense['dl'])[-1], np.cumsum(well.trajectory['dl'])[-1])
+
+    grid = well.resample(step=90.0, keep_stations=False)
+    t = grid.trajectory
+    np.testing.assert_array_equal(t['md'], np.r_[np.arange(0, 3000, 90.0), 3000.0])
+    points = well.get_points(t['md'][1:-1])
+    for key in ('inc', 'azi', 'tvd', 'north', 'east'):
+        np.testing.assert_allclose(t[key][1:-1], points[key], atol=1e-9)
+    expected = scalar_survey(t['md'][1:], t['inc'][1:], t['azi'][1:])
+    np.testing.assert_allclose(t['dl'], expected['dl'], atol=1e-9)
+    assert grid.get_point(1335.0)['north'] == pytest.approx(well.get_point(1335.0)['north'], abs=0.05)
+
+# get_point与旧的逐点插值一致；截取的井段上，浅于第一个测点的井深抛出ValueError
+def test_get_point_matches_scalar(well, scalar):
+    point = well.get_point(1234.5)
+    expected = scalar_point(scalar, 1234.5)
+    for key in ('inc', 'azi', 'tvd', 'north', 'east', 'dl'):
+        assert point[key] == pytest.approx(expected[key], abs=1e-8)
+
+    part = FieldStore.from_wells([well], ['a']).select(md=(1000, 3000)).well('a')
+    for md in (500.0, np.nan, 3100.0):
+        with pytest.raises(ValueError):
+            part.get_point(md)
+    assert part.get_point(1500.0)['tvd'] == pytest.approx(well.get_point(1500.0)['tvd'])
+
+
+# 批量取点与逐点结果相同，且不改变轨迹；截取的井段上，浅于第一个测点的井深与NaN抛出ValueError
+def test_get_points_matches_get_point(well):
+    md = np.array([0.0, 15.0, 300.0, 777.7, 2999.0])
+    points = well.get_points(md)
+    for k, m in enumerate(md):
+        point = well.get_point(m)
+        for key in ('inc', 'azi', 'tvd', 'north', 'east', 'dl'):
+            assert points[key][k] == pytest.approx(point[key], abs=1e-9)
+    assert well.npoints == 101
+
+    part = FieldStore.from_wells([well], ['a']).select(md=(1000, 3000)).well('a')
+    with pytest.raises(ValueError):
+        part.get_points([500.0, 1500.0])
+    with pytest.raises(ValueError):
+        part.get_points([np.nan])
+
+
+# 批量插点：插值点与标量插值一致，测段狗腿角拆分后总和不变
+def test_insert_points(well, scalar):
+    md = np.array([45.0, 1234.5, 2001.0, 1234.5])
+    index = well.insert_points(md)
+    t = well.trajectory
+    assert len(t) == 104
+    assert list(t['md'][index]) == list(md)
+    expected = scalar_point(scalar, 2001.0)
+    assert t['north'][index[2]] == pytest.approx(expected['north'], abs=1e-8)
+    assert t['dl'].sum() == pytest.approx(scalar['dl'].sum())
+
+
+# 垂深求井深：返回的井深处垂深等于给定值，且是首次到达；截取的井段上，浅于第一个测点的垂深与NaN抛出ValueError；旧接口按垂深取点的返回值不变
+def test_md_at_tvd(well):
+    tvd = np.array([100.0, 800.0, 1500.0, 2100.0])
+    md = well.md_at_tvd(tvd)
+    np.testing.assert_allclose(well.get_points(md)['tvd'], tvd, atol=1e-6)
+    grid = np.linspace(0, 3000, 30001)
+    np.testing.assert_allclose(md, np.interp(tvd, well.get_points(grid)['tvd'], grid), atol=0.2)
+    for value in (1e5, np.nan):
+        with pytest.raises(ValueError):
+            well.md_at_tvd([value])
+
+    part = FieldStore.from_wells([well], ['a']).select(md=(1000, 3000)).well('a')
+    with pytest.raises(ValueError):
+        part.md_at_tvd([100.0])
+    np.testing.assert_allclose(part.md_at_tvd(tvd[2:]), md[2:], atol=1e-9)
+
+    station = well.trajectory[20]
+    assert well.get_any_point(station['tvd'], depth_type='tvd')['md'] == station['md']
+    assert well.get_any_point(1500.0, depth_type='tvd') is well.trajectory  # 旧接口插入插值点，返回轨迹
+    assert well.npoints == 102 and md[2] in well.trajectory['md']
+
+
+# 派生量（狗腿严重度、增量）按需由列计算
+def test_derived_fields(well):
+    t = well.trajectory
+    np.testing.assert_allclose(t['dls'][1:], t['dl'][1:] * 30 / np.diff(t['md']))
+    np.testing.assert_allclose(t.delta('tvd')[1:], np.diff(t['tvd']))
+    assert t[5]['delta']['md'] == pytest.approx(30.0)
+
+
+# 分块读取与一次读取相同；空文件、分块读取时要求质量检查抛出ValueError
+def test_chunked_csv(tmp_path, frame, well):
+    path = str(tmp_path / 'survey.csv')
+    frame.to_csv(path, index=False)
+    chunked = wp.load(path, chunksize=7)
+    assert_columns(chunked.trajectory, well.trajectory, atol=1e-9)
+    with pytest.raises(ValueError):
+        wp.load(path, chunksize=7, qc='reject')
+
+    empty = str(tmp_path / 'empty.csv')
+    frame.iloc[:0].to_csv(empty, index=False)
+    for kwargs in ({}, {'chunksize': 7}):
+        with pytest.raises(ValueError):
+            wp.load(empty, **kwargs)
+
+
+# 表头别名与字符串数值
+def test_header_aliases(frame, well):
+    data = pd.DataFrame({'MeasuredDepth(m)': frame['md'].astype(str), 'Inc(deg)': frame['inc'], 'Azimuth': frame['azi']})
+    assert_columns(wp.load(data).trajectory, well.trajectory, atol=0)
+
+
+# 缓存：命中与未命中返回相同的井，包括质量检查结果与原始数据；写缓存失败不影响读取
+def test_cache_hit_matches_miss(tmp_path, frame):
+    path = str(tmp_path / 'survey.csv')
+    frame.to_csv(path, index=False)
+    cache_dir = str(tmp_path / 'cache')
+    miss = wp.load(path, cache_dir=cache_dir)
+    hit = wp.load(path, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 3
+    assert_columns(hit.trajectory, miss.trajectory, keys=FLOAT_COLUMNS, atol=0)
+    assert list(hit.trajectory['sectionType']) == list(miss.trajectory['sectionType'])
+    assert hit._base_data.equals(miss._base_data)
+    assert not hasattr(wp.load(path, cache_dir=cache_dir, chunksize=7), '_base_data')
+
+    blocked = str(tmp_path / 'blocked')
+    open(blocked, 'w').close()  # 缓存目录无法创建时照常读取
+    assert_columns(wp.load(path, cache_dir=blocked).trajectory, miss.trajectory, keys=FLOAT_COLUMNS, atol=0)
+
+    miss = wp.load(path, cache_dir=cache_dir, qc='clean')
+    hit = wp.load(path, cache_dir=cache_dir, qc='clean')
+    np.testing.assert_array_equal(hit.qc_flags, miss.qc_flags)
+
+
+# 一个工作簿多口井，与逐口读取相同
+def test_load_workbook(tmp_path, frame, well):
+    pytest.importorskip('openpyxl')
+    path = str(tmp_path / 'wells.xlsx')
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        frame.to_excel(writer, sheet_name='A', index=False)
+        frame.iloc[:50].to_excel(writer, sheet_name='B', index=False)
+    wells = wp.load_workbook(path)
+    assert sorted(wells) == ['A', 'B']
+    assert_columns(wells['A'].trajectory, well.trajectory, atol=1e-9)
+    assert wells['B'].npoints == 51
+
+
+# 采用已有坐标：与计算结果相同，坐标不一致时抽查抛出ValueError，方位改变时井口点方位仍为0，质量检查不被忽略
+def test_trusted_coordinates(well):
+    data = coordinate_frame(well)
+    trusted = wp.load(data.copy(), trusted_coordinates=True, check_every=5)
+    assert_columns(trusted.trajectory, well.trajectory, atol=1e-9)
+
+    columns = trusted_survey(*(data[key].values for key in ('md', 'inc', 'azi', 'tvd', 'north', 'east')),
+                             change_azimuth=7)
+    assert columns['azi'][0] == 0
+    assert columns['dl'][1] == pytest.approx(well.trajectory['dl'][1])
+
+    shifted = data.copy()
+    shifted.loc[20, 'tvd'] += 5
+    with pytest.raises(ValueError):
+        wp.load(shifted, trusted_coordinates=True, check_every=1)
+
+    data.loc[20, 'inc'] = 200
+    with pytest.raises(ValueError):
+        wp.load(data.copy(), trusted_coordinates=True, qc='reject')
+    cleaned = wp.load(data.copy(), trusted_coordinates=True, qc='clean')
+    assert cleaned.npoints == well.npoints - 1
+    assert cleaned.qc_flags[20] & FLAGS['inc_range']
+
+
+# 随钻追加测点与整体读取相同
+def test_append_survey(frame, well):
+    partial = wp.load(frame.iloc[:40].copy())
+    for row in frame.iloc[40:60].itertuples():
+        partial.append_survey(row.md, row.inc, row.azi)
+    rest = frame.iloc[60:]
+    partial.append_surveys(rest['md'].values, rest['inc'].values, rest['azi'].values)
+    assert_columns(partial.trajectory, well.trajectory, atol=1e-9)
+    np.testing.assert_allclose(partial.trajectory['dls'], well.trajectory['dls'])
+    with pytest.raises(ValueError):
+        partial.append_survey(10.0, 0, 0)
+
+
+# 轨迹版本：经任何途径修改轨迹都使版本增加，只读快照的版本与原井相同
+def test_well_version(well):
+    versions = [well.version]
+    well.append_survey(3030.0, 80.0, 92.0)
+    versions.append(well.version)
+    well.update_station(50, inc=35.0, azi=60.0)
+    versions.append(well.version)
+    well.insert_points([100.5])
+    versions.append(well.version)
+    well.trajectory[5]['inc'] = 1.0
+    versions.append(well.version)
+    well.interp_any_point(200.5)
+    versions.append(well.version)
+    well.get_any_point(300.5)
+    versions.append(well.version)
+    assert (np.diff(versions) > 0).all()
+    assert well.freeze().version == well.version
+
+# 修改一个测点后增量更新与重新读取相同
+def test_update_station(frame, well):
+    edited = frame.copy()
+    edited.loc[49, ['inc', 'azi']] = (35.0, 60.0)
+    well.update_station(50, inc=35.0, azi=60.0)
+    expected = wp.load(edited).trajectory
+    assert_columns(well.trajectory, expected, atol=1e-8)
+    np.testing.assert_allclose(well.trajectory.delta('tvd'), expected.delta('tvd'), atol=1e-8)
+    assert list(well.trajectory['sectionType']) == list(expected['sectionType'])
+
+
+# 只读快照：不能修改（包括旧的插点接口），插点返回新快照，原井不变
+def test_frozen_well(well):
+    frozen = well.freeze()
+    assert isinstance(frozen, FrozenWell)
+    for method, args in (('insert_points', ([100.0],)), ('append_survey', (3100.0, 80, 90)),
+                         ('update_station', (5, 1.0, 1.0)), ('interp_any_point', (100.5,)),
+                         ('get_any_point', (100.5,))):
+        with pytest.raises(TypeError, match='FrozenWell'):
+            getattr(frozen, method)(*args)
+
+    inserted = frozen.with_points([100.5, 2000.5])
+    assert inserted.npoints == frozen.npoints + 2
+    assert frozen.npoints == well.npoints == 101
+    assert frozen.with_points([30.0]) is frozen
+    well.insert_points([100.5, 2000.5])
+    assert_columns(inserted.trajectory, well.trajectory, keys=FLOAT_COLUMNS, atol=0)
+
+
+# 冻结不改变原井数组的可写性，原井之后的修改先复制与快照共享的数组，快照不变
+def test_freeze_copy_on_write(well):
+    t = well.trajectory
+    t['dls'], t['sectionType']  # 缓存也与快照共享
+    frozen = well.freeze().trajectory
+    expected = {key: frozen[key].copy() for key in FLOAT_COLUMNS + ('dls', 'sectionType')}
+    assert t['inc'].flags.writeable and not frozen['inc'].flags.writeable
+
+    t[3]['inc'] = 1.0
+    well.update_station(50, inc=35.0, azi=60.0)
+    well.append_survey(3030.0, 80.0, 92.0)
+    assert well.trajectory['inc'][3] == 1.0 and well.npoints == 102
+    for key, values in expected.items():
+        np.testing.assert_array_equal(frozen[key], values)
+
+# 共享内存中的井与原井相同
+def test_shared_well(well):
+    shared = SharedWell(well)
+    try:
+        attached = shared.attach()
+        assert isinstance(attached, FrozenWell)
+        assert_columns(attached.trajectory, well.trajectory, keys=FLOAT_COLUMNS, atol=0)
+        assert list(attached.trajectory['sectionType']) == list(well.trajectory['sectionType'])
+        attached.shared_memory.close()
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+# Parquet往返不变，按井、井深读取与内存中筛选相同；重写为更少的井时不留下旧分区
+def test_field_store_parquet(tmp_path, frame):
+    pytest.importorskip('pyarrow')
+    wells = [wp.load(frame.copy(), change_azimuth=k * 30) for k in range(3)]
+    field = FieldStore.from_wells(wells, ['a', 'b', 'c'])
+    path = str(tmp_path / 'field')
+    field.write(path)
+    read = FieldStore.read(path)
+    assert read.names == ['a', 'b', 'c']
+    for key in FLOAT_COLUMNS:
+        np.testing.assert_array_equal(read.columns[key], field.columns[key])
+    part = FieldStore.read(path, wells=['b'], md=(1000, 2000))
+    np.testing.assert_array_equal(part.columns['md'], field.select(wells=['b'], md=(1000, 2000)).columns['md'])
+
+    FieldStore.from_wells(wells[:1], ['a']).write(path)
+    assert sorted(os.listdir(path)) == ['_wells.json', 'well=0']
+
+
+# 防碰扫描与逐对求点到测段距离的结果相同
+def test_closest_approach(frame, well):
+    offsets = [wp.load(frame.copy(), set_start={'north': 40.0 * k, 'east': 25.0}, change_azimuth=10 * k)
+               for k in range(1, 4)]
+    result = closest_approach(well, offsets, radius=200)
+
+    query = np.stack([well.trajectory[key] for key in ('north', 'east', 'tvd')], axis=1)
+    for w, offset in enumerate(offsets):
+        xyz = np.stack([offset.trajectory[key] for key in ('north', 'east', 'tvd')], axis=1)
+        p0, d = xyz[:-1], xyz[1:] - xyz[:-1]
+        t = np.clip(np.einsum('qsk,sk->qs', query[:, None] - p0, d) / np.einsum('sk,sk->s', d, d), 0, 1)
+        distance = np.linalg.norm(query[:, None] - (p0 + t[..., None] * d), axis=2).min(axis=1)
+        distance[distance > 200] = np.inf
+        np.testing.assert_allclose(result['distance'][w], distance, atol=1e-9)
+
+
+# 水平地层面：穿越井深与沿弦按垂深插值相同
+def test_formation_crossings(well):
+    north = np.linspace(-500, 3000, 8)
+    east = np.linspace(-500, 3000, 9)
+    surfaces = {'top': np.full((8, 9), 1200.0), 'base': np.full((8, 9), 1800.0)}
+    result = formation_crossings([well], north, east, surfaces)
+    t = well.trajectory
+    np.testing.assert_allclose(result['first_md'][0], np.interp([1200.0, 1800.0], t['tvd'], t['md']), atol=1e-9)
+    assert list(result['surface']) == [0, 1]
+
+
+# 地理坐标：井口处为井口经纬度，向北1 km纬度增加约0.009°，整个油田与单井的结果相同
+def test_geographic_coordinates(well):
+    lat, lon = to_geographic([0.0, 1000.0], [0.0, 0.0], 30.0, 110.0)
+    assert lat[0] == pytest.approx(30.0) and lon[1] == pytest.approx(110.0)
+    assert lat[1] - 30.0 == pytest.approx(1000.0 / 110850.0, rel=1e-3)
+
+    well.add_location(30.0, 110.0)
+    coordinates = well.geo_coordinates()
+    field = field_coordinates(FieldStore.from_wells([well], ['a']))
+    np.testing.assert_allclose(field['lat'], coordinates['lat'])
+    np.testing.assert_allclose(field['lon'], coordinates['lon'])
+    hover = well.plot(plot_type='top', geographic=True).data[0].hovertemplate
+    assert hover.count(':.6f') == 2  # 经纬度显示到约0.1 m
+
+
+# 质量检查的各项标志
+def test_survey_flags():
+    md = np.array([0, 30, 60, 60, 50, 90, 120, 150])
+    inc = np.array([0, 1, 2, 2, 3, 190, 5, 40])
+    azi = np.array([0, 10, 10, 10, 10, 370, 10, 10])
+    flags = survey_flags(md, inc, azi)
+    assert flags[3] == FLAGS['duplicate']
+    assert flags[4] & FLAGS['md_order']
+    assert flags[5] & FLAGS['inc_range'] and flags[5] & FLAGS['azi_wrap']
+    assert flags[7] & FLAGS['inc_jump'] and flags[7] & FLAGS['dls']
+    assert not flags[:3].any()
+
+
+# 读取时的质量检查：在去掉缺失行之前进行，标志与原数据各行对应；qc_drop选择清洗或拒绝的检查项
+def test_load_qc(frame):
+    data = frame.copy()
+    data.loc[3, 'inc'] = np.nan
+    cleaned = wp.load(data.copy(), qc='clean')
+    assert len(cleaned.qc_flags) == len(data)
+    assert cleaned.qc_flags[3] == FLAGS['missing']
+    assert cleaned.npoints == len(data)
+    with pytest.raises(ValueError, match='missing'):
+        wp.load(data.copy(), qc='reject')
+
+    data = frame.copy()
+    data.loc[60, 'inc'] += 80
+    assert wp.load(data.copy(), qc='reject').qc_flags[60] & FLAGS['dls']
+    with pytest.raises(ValueError, match='dls'):
+        wp.load(data.copy(), qc='reject', qc_drop=('md_order', 'dls'))
+    cleaned = wp.load(data.copy(), qc='clean', qc_drop=('inc_jump',))
+    dropped = (cleaned.qc_flags & FLAGS['inc_jump']) != 0
+    assert dropped[60]
+    np.testing.assert_array_equal(cleaned.trajectory['md'][1:], data['md'][~dropped])
+
+# 滑动窗口狗腿严重度与逐点的区间最大值相同
+def test_dls_analytics(well):
+    t = well.trajectory
+    md = np.concatenate((t['md'], t['md']))
+    dl = np.concatenate((t['dl'], t['dl'] * 2))
+    well_index = np.repeat([0, 1], len(t))
+    result = dls_analytics(md, dl, window=100.0, threshold=6.0, well_index=well_index)
+    for k in range(len(md)):
+        same = (well_index == well_index[k]) & (np.arange(len(md)) <= k) & (md > md[k] - 100.0)
+        assert result['max_dls'][k] == pytest.approx(result['dls'][same].max())
+    np.testing.assert_allclose(result['cumulative_dogleg'][len(t):], np.cumsum(t['dl']) * 2)
+    assert [spot['well'] for spot in result['hot_spots']] == [1]  # 造斜点处狗腿严重度5°/30 m，加倍后超过阈值
+
+
+# 测段表缓存在轨迹上，轨迹改变后重新计算
+def test_segment_table(well, scalar):
+    t = well.trajectory
+    table = t.cached('segments', segment_table)
+    assert t.cached('segments', segment_table) is table
+    np.testing.assert_allclose(np.degrees(table['theta']), scalar['dl'][1:], atol=1e-10)
+
+    point = well.get_point(2222.2)
+    expected = scalar_point(scalar, 2222.2)
+    for key in ('inc', 'azi', 'tvd', 'north', 'east'):
+        assert point[key] == pytest.approx(expected[key], abs=1e-8)
+    well.append_survey(3030.0, 80.0, 92.0)
+    assert len(well.trajectory.cached('segments', segment_table)['theta']) == well.npoints - 1
@@ -1,2 +1,3 @@
 import torque_and_drag.architecture
 import torque_and_drag.torque_drag
+import torque_and_drag.shared
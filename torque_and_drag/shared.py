@@ -0,0 +1,76 @@
+from multiprocessing import shared_memory
+from numbers import Number
+import numpy as np
+
+
+class SharedString(object):
+    def __init__(self, string, name=None):
+        """
+        将井身结构或管串（String、WellBore、BHA）的分段表复制到一块共享内存中，数值参数每段一行、每个参数一列；
+        非数值参数（如名字）随本对象pickle。子进程调用attach()重建同类的对象
+        :param string: String、WellBore或BHA
+        :param name: 共享内存块名，默认自动生成
+        """
+        sections = list(string.sections.values())
+        self.cls = type(string)
+        self.attrs = {key: getattr(string, key) for key in ('name', 'top', 'bottom', 'method', 'complete')}
+        self.fields = [key for key in dict.fromkeys(k for section in sections for k in section)
+                       if all(_is_number(section.get(key, np.nan)) for section in sections)]
+        self.integer = [all(isinstance(section.get(key, 0), int) for section in sections) for key in self.fields]
+        self.objects = [{k: v for k, v in section.items() if k not in self.fields} for section in sections]
+        self.keys = [list(section) for section in sections]  # 各段参数的原顺序
+        self.shape = (len(sections), len(self.fields))
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(8 * self.shape[0] * self.shape[1], 1), name=name)
+        self.name = self._shm.name
+        table = np.ndarray(self.shape, dtype=np.float64, buffer=self._shm.buf)
+        for col, key in enumerate(self.fields):
+            table[:, col] = [section.get(key, np.nan) for section in sections]  # 缺少的参数为NaN
+        del table
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_shm'] = None
+        return state
+
+    def attach(self):
+        """
+        由共享内存中的分段表重建井身结构或管串
+        :return: 与原对象同类的对象，table属性为共享内存中只读的分段表（每段一行，列为fields）
+        """
+        shm = shared_memory.SharedMemory(name=self.name)
+        table = np.ndarray(self.shape, dtype=np.float64, buffer=shm.buf)
+        table.setflags(write=False)
+
+        string = self.cls.__new__(self.cls)
+        for key, value in self.attrs.items():
+            setattr(string, key, value)
+        string.sections = {}
+        for i, objects in enumerate(self.objects):
+            values = dict(objects)
+            for col, (key, integer) in enumerate(zip(self.fields, self.integer)):
+                if not np.isnan(table[i, col]):
+                    values[key] = int(table[i, col]) if integer else float(table[i, col])
+            string.sections[i] = {key: values[key] for key in self.keys[i] if key in values}
+        string.table = table
+        string.fields = list(self.fields)
+        string.shared_memory = shm
+        return string
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """
+        释放共享内存，所有进程都不再使用后由创建者调用
+        """
+        shm = self._shm or shared_memory.SharedMemory(name=self.name)
+        shm.unlink()
+        shm.close()
+        self._shm = None
+
+
+def _is_number(value):
+    return isinstance(value, Number) and not isinstance(value, bool)
@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 # import wellbore_trajectories as wp
 from copy import deepcopy
 
@@ -35,6 +34,7 @@ class TorqueDrag:
         self.string = string  # 传管串数据
         self.fluid_density = fluid_density  # 传钻井液密度
         self.name = name  # 设置名字
+        self.well_version = well.version  # 计算所用轨迹的版本
         self.add_well_points_from_strings()  # 根据管串结构与井身结构，增加节点
 
         self.get_buoyancy_factors()  # 获取浮力系数
@@ -50,27 +50,22 @@ class TorqueDrag:
         if any((wob, tob, overpull)):
             self.get_forces_and_torsion(wob=wob, tob=tob, overpull=overpull)
 
+    @property
+    def stale(self):
+        """
+        井轨迹在计算之后是否已改变（如随钻追加了测点）
+        """
+        return self.well.version != self.well_version
+
     def add_well_points_from_strings(self):
         """
         根据管串结构与井身结构，增加节点
         :return:
         """
-        well_copy = deepcopy(self.well)
-        trajectory_copy = deepcopy(self.well.trajectory)  # 深拷贝，以免变化影响原数据,这个值是字典的列表
-        trajectory = pd.DataFrame(trajectory_copy)  # 将字典的列表转换成Dataframe
-        md = np.array(trajectory['md']).tolist()  # 将Dataframe中的md列先转成array，在变成列表
-
-        for k, v in self.wellbore.sections.items():
-            if v['bottom'] in md:
-                continue
-            else:
-                well_copy.interp_any_point(v['bottom'])
-        for k, v in self.string.sections.items():
-            if v['bottom'] in md:
-                continue
-            else:
-                well_copy.interp_any_point(v['bottom'])
-        self.trajectory = well_copy.trajectory  # 将self.trajectory这个属性引用的值转移到trajectory上
+        bottoms = [v['bottom'] for v in self.wellbore.sections.values()]
+        bottoms += [v['bottom'] for v in self.string.sections.values()]
+        snapshot = self.well.freeze()  # 只读快照与原井共享数组，不必深拷贝
+        self.trajectory = snapshot.with_points(bottoms).trajectory  # 一次插入全部分段点，已有测点的忽略
 
     def get_buoyancy_factors(self):
         """
@@ -80,34 +75,22 @@ class TorqueDrag:
             v['buoyancy_factor'] = buoyancy_factor(self.fluid_density, v['density'])
 
     def get_weight_buoyed_and_radius(self):
-        section = 0
-        weights = [0]
-        weights_line = [0]  # 单位在流体中的线重
-        diameter = [self.get_characteristic_od(section)]
-        trajectory = pd.DataFrame(self.trajectory)
-        self.md = np.array(trajectory['md'])
+        self.md = self.trajectory['md']
         self.delta_md = np.zeros_like(self.md)
         self.delta_md[1:] = self.md[1:] - self.md[:-1]
-        for i, j in zip(self.md[1:], self.delta_md[1:]):
-            if i > self.string.bottom:
-                break
-            while 1:
-                if self.string.sections[section]['top'] < i <= self.string.sections[section]['bottom']:
-                    weights.append(self.string.sections[section]['unit_weight'] * j
-                                   * self.string.sections[section]['buoyancy_factor'])  # 注意单位为N
-                    weights_line.append(self.string.sections[section]['unit_weight']
-                                        * self.string.sections[section]['buoyancy_factor'])  # 单位为N/m
-                    diameter.append(self.get_characteristic_od(section))
-                    break
-                else:
-                    section += 1
-        self.weight_buoyed = np.array(weights)  # 测段每节点与上一节点部分在钻井液中的浮重，array类型，N
-        self.weight_buoyed_line = np.array(weights_line)  # 节点所处部分的单位线重，N/m
-        self.radius = np.array(diameter) / 2  # 节点处外半径，array类型
+        sections = [self.string.sections[k] for k in range(len(self.string.sections))]
+        md = self.md[1:][self.md[1:] <= self.string.bottom]  # 管柱底部以上的节点
+        section = section_index(sections, md)  # 各节点所在管串段，二分查找
+
+        unit_weight = np.array([v['unit_weight'] for v in sections])[section]
+        buoyancy = np.array([v['buoyancy_factor'] for v in sections])[section]
+        diameter = np.array([self.get_characteristic_od(k) for k in range(len(sections))])
+        self.weight_buoyed = np.r_[0, unit_weight * self.delta_md[1:len(md) + 1] * buoyancy]  # 测段每节点与上一节点部分在钻井液中的浮重，array类型，N
+        self.weight_buoyed_line = np.r_[0, unit_weight * buoyancy]  # 节点所处部分的单位线重，N/m
+        self.radius = np.r_[diameter[0], diameter[section]] / 2  # 节点处外半径，array类型
 
     def get_inc_delta(self):
-        trajectory = pd.DataFrame(self.trajectory)
-        self.inc = np.array(trajectory['inc'])  # 每测点井斜角，角度表示
+        self.inc = self.trajectory['inc']  # 每测点井斜角，角度表示
         self.inc_rad = np.radians(self.inc)  # 每测点井斜角，用弧度表示
         self.delta_inc = np.zeros_like(self.inc)  # 每测点距离上测点的井斜角变化量,角度表示
         self.delta_inc_rad = np.zeros_like(self.inc_rad)  # 每测点距离上测点的井斜角变化量，弧度表示
@@ -118,8 +101,7 @@ class TorqueDrag:
         self.inc_rate[1:] = self.delta_inc_rad[1:] / self.delta_md[1:]  # 变化率用rad每米表示
 
     def get_azi_delta(self):
-        trajectory = pd.DataFrame(self.trajectory)
-        self.azi = np.array(trajectory['azi'])  # 每测点方位角，角度表示
+        self.azi = self.trajectory['azi']  # 每测点方位角，角度表示
         self.azi_rad = np.radians(self.azi)  # 每测点方位角，用弧度表示
         self.delta_azi = np.zeros_like(self.azi)  # 每测点距离上测点的方位角变化量,角度表示
         self.delta_azi_rad = np.zeros_like(self.azi_rad)  # 每测点距离上测点的方位角变化量，弧度表示
@@ -140,36 +122,23 @@ class TorqueDrag:
             return self.string.sections[section]['od']
 
     def get_coeff_friction_sliding(self, v, n):
-        section = 0
-        friction = [self.wellbore.sections[section]['coeff_friction_sliding']]
-        friction_d = [v / np.sqrt(v ** 2 + (self.radius[0] * np.pi * n * self.radius[0] / 30) ** 2) * friction[0]]  # 轴向摩阻系数
-        friction_t = [(self.radius[0] * np.pi * n * self.radius[0] / 30) / \
-                      np.sqrt(v ** 2 + (self.radius[0] * np.pi * n * self.radius[0] / 30) ** 2) * friction[0]]  # 周向（切向）摩阻系数
-        for i, j in zip(self.md[1:], self.delta_md[1:]):
-            if i > self.wellbore.bottom:
-                break
-            while 1:
-                if self.wellbore.sections[section]['top'] < i <= self.wellbore.sections[section]['bottom']:
-                    friction.append(self.wellbore.sections[section]['coeff_friction_sliding'])
-                    friction_d.append(v / np.sqrt(v ** 2 + (self.radius[0] * np.pi * n * self.radius[0] / 30) ** 2) * \
-                                      self.wellbore.sections[section]['coeff_friction_sliding'])
-                    friction_t.append((self.radius[0] * np.pi * n * self.radius[0] / 30) / \
-                                      np.sqrt(v ** 2 + (self.radius[0] * np.pi * n * self.radius[0] / 30) ** 2) * \
-                                      self.wellbore.sections[section]['coeff_friction_sliding'])
-                    break
-                else:
-                    section += 1
-        self.coeff_friction_sliding = np.array(friction)  # 测段每一节点与上一节点这一段的摩阻系数
-        self.coeff_friction_sliding_d = np.array(friction_d)  # 对应轴向摩阻系数
-        self.coeff_friction_sliding_t = np.array(friction_t)  # 对应周向摩阻系数
+        sections = [self.wellbore.sections[k] for k in range(len(self.wellbore.sections))]
+        md = self.md[1:][self.md[1:] <= self.wellbore.bottom]  # 井底以上的节点
+        coeff = np.array([s['coeff_friction_sliding'] for s in sections])
+        friction = np.r_[coeff[0], coeff[section_index(sections, md)]]
+
+        speed = self.radius[0] * np.pi * n * self.radius[0] / 30  # 周向速度项，各节点相同，只算一次
+        total = np.sqrt(v ** 2 + speed ** 2)
+        self.coeff_friction_sliding = friction  # 测段每一节点与上一节点这一段的摩阻系数
+        self.coeff_friction_sliding_d = v / total * friction  # 对应轴向摩阻系数
+        self.coeff_friction_sliding_t = speed / total * friction  # 对应周向（切向）摩阻系数
 
     def get_well_curvature(self):
-        curvature = [self.trajectory[1]['dl'] / self.delta_md[1]]
-        for i, j in enumerate(self.md):
-            if i == 0:
-                continue
-            curvature.append(self.trajectory[i]['dl'] / self.delta_md[i])
-        self.curvature = np.array(curvature)  # 测段每一点的井眼曲率，单位度每米
+        dl = self.trajectory['dl']
+        curvature = np.empty_like(dl)
+        curvature[0] = dl[1] / self.delta_md[1]
+        curvature[1:] = dl[1:] / self.delta_md[1:]
+        self.curvature = curvature  # 测段每一点的井眼曲率，单位度每米
         self.curvature_rad = np.radians(self.curvature)  # 测段每一点井眼曲率，单位rad每米
 
     def get_forces_and_torsion(self, wob=False, tob=False, overpull=False):
@@ -284,6 +253,17 @@ def buoyancy_factor(fluid_density, string_density=7.85):
     return result
 
 
+def section_index(sections, md):
+    """
+    各井深所在的分段（top < md <= bottom），sections按深度排列且首尾相接
+    :param sections: 分段字典的列表
+    :param md: 井深数组
+    :return: 分段序号数组
+    """
+    bottoms = np.array([v['bottom'] for v in sections])
+    return np.minimum(np.searchsorted(bottoms, md, side='left'), len(sections) - 1)
+
+
 def force_normal(force_tension, inc_average, inc_delta, azi_delta, weight_buoyed):
     result = np.sqrt((force_tension * azi_delta * np.sin(inc_average)) ** 2
                      + (force_tension * inc_delta + weight_buoyed * np.sin(inc_average)) ** 2)
@@ -384,6 +364,7 @@ class HookLoad:
         self.data = {}
         self.md_range = np.arange(self.string.top + self.step, self.string.bottom, self.step).tolist()
         self.md_range.append(self.string.bottom)
+        well = self.well.freeze()  # 各工况共用一个只读快照
 
         for ff in self.ff_range:
             wellbore_temp = deepcopy(self.wellbore)
@@ -395,7 +376,7 @@ class HookLoad:
 
             for md in self.md_range:
                 bha_temp = self.string.depth(md)
-                data_temp.append(TorqueDrag(self.well, wellbore_temp, bha_temp, fluid_density=self.fluid_density,
+                data_temp.append(TorqueDrag(well, wellbore_temp, bha_temp, fluid_density=self.fluid_density,
                                             name=self.name))
             for t in data_temp[0].tension.keys():
                 self.data[ff][t] = [d.tension[t][0] for d in data_temp]
@@ -1 +1,6 @@
-from .load_trajectory import load
\ No newline at end of file
+from .load_trajectory import load, load_workbook
+from .trajectory import Trajectory
+from .shared import SharedWell
+from .field import FieldStore
+from .anticollision import closest_approach
+from .formations import formation_crossings
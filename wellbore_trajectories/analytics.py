@@ -0,0 +1,102 @@
+import numpy as np
+
+
+def dls_analytics(md, dl, dls_resolution=30, window=30.0, threshold=None, well_index=None):
+    """
+    沿井深的狗腿严重度统计，一次向量化计算：
+    滑动窗口内的最大狗腿严重度（稀疏表求区间最大值）、窗口平均狗腿严重度与累计狗腿角（前缀和）、弯曲度指数
+    :param md: 井深数组，可以是多口井依次连接（每口井内递增）
+    :param dl: 各测点与上一测点间的狗腿角数组, °
+    :param dls_resolution: 狗腿严重度的分辨率，可以是与md等长的数组
+    :param window: 窗口长度（井深），窗口为(md - window, md]
+    :param threshold: 狗腿严重度阈值，超过的连续井段记为狗腿集中段，默认不统计
+    :param well_index: 各测点所属井的序号，多口井连接时窗口、累计量都不跨井
+    :return: 字典
+        dls: 各测点狗腿严重度
+        max_dls: 窗口内最大狗腿严重度
+        window_dls: 窗口平均狗腿严重度（窗口内累计狗腿角 / 窗口长度）
+        cumulative_dogleg: 自井口的累计狗腿角, °
+        tortuosity: 弯曲度指数，自井口的平均狗腿严重度（累计狗腿角 / 井深长度）
+        hot_spots: 狗腿集中段的列表，每段为字典{'well', 'top', 'bottom', 'max_dls'}，threshold为None时为空
+    """
+    md = np.asarray(md, dtype=np.float64)
+    dl = np.asarray(dl, dtype=np.float64)
+    n = len(md)
+    well_index = np.zeros(n, dtype=np.int64) if well_index is None else np.asarray(well_index)
+    first = np.r_[True, well_index[1:] != well_index[:-1]]  # 每口井的第一个测点
+    start = np.maximum.accumulate(np.where(first, np.arange(n), 0))  # 所在井第一个测点的索引
+
+    delta_md = np.where(first, 0, md - np.r_[md[:1], md[:-1]])
+    dl = np.where(first, 0, dl)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dls = np.where(delta_md > 0, dl * dls_resolution / delta_md, 0)
+
+    # 前缀和：每口井内的累计狗腿角
+    total = np.cumsum(dl)
+    cumulative = total - (total - dl)[start]
+    length = md - md[start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tortuosity = np.where(length > 0, cumulative * dls_resolution / length, 0)
+
+    # 井深加上按井递增的偏移后全局单调，二分查找窗口起点时不会跨井
+    shift = well_index * (np.abs(md).max(initial=0) * 2 + window + 1)
+    key = md + shift
+    window_top = np.maximum(md - window, md[start])
+    index = np.arange(n)
+    lo = np.minimum(np.searchsorted(key, window_top + shift, side='right'), index)
+    max_dls = _range_max(dls, lo, index)  # 窗口内的测点，含测点本身（其测段在窗口内结束）
+    top_dogleg = np.interp(window_top + shift, key, total)  # 累计狗腿角沿测段线性，窗口起点处插值
+    with np.errstate(divide='ignore', invalid='ignore'):
+        window_dls = np.where(md > window_top, (total - top_dogleg) * dls_resolution / (md - window_top), 0)
+
+    result = {'dls': dls, 'max_dls': max_dls, 'window_dls': window_dls,
+              'cumulative_dogleg': cumulative, 'tortuosity': tortuosity, 'hot_spots': []}
+    if threshold is not None:
+        result['hot_spots'] = _hot_spots(md, dls, threshold, well_index, first)
+    return result
+
+
+def field_analytics(field, window=30.0, threshold=None):
+    """
+    一个油田全部井的狗腿严重度统计，见dls_analytics
+    :param field: FieldStore
+    :return: 字典，各数组与field.columns等长；hot_spots中的well为井名
+    """
+    counts = np.diff(field.offsets)
+    resolution = np.repeat([info.get('dlsResolution', 30) for info in field.infos], counts)
+    result = dls_analytics(field.columns['md'], field.columns['dl'], resolution, window, threshold, field.well_index)
+    for spot in result['hot_spots']:
+        spot['well'] = field.names[spot['well']]
+    return result
+
+
+def _range_max(values, lo, hi):
+    """
+    稀疏表求区间最大值values[lo:hi + 1]，只建到最长区间所需的层数
+    """
+    span = hi - lo + 1
+    if not len(values):
+        return values.copy()
+    top = int(span.max()).bit_length() - 1
+    levels = [values]
+    for k in range(1, top + 1):
+        prev, half = levels[-1], 1 << (k - 1)
+        levels.append(np.maximum(prev[:-half], prev[half:]))  # levels[k][i] = max(values[i:i + 2**k])
+    table = np.full((top + 1, len(values)), -np.inf)
+    for k, level in enumerate(levels):
+        table[k, :len(level)] = level
+    k = np.floor(np.log2(span)).astype(np.int64)
+    return np.maximum(table[k, lo], table[k, hi - (1 << k) + 1])
+
+
+def _hot_spots(md, dls, threshold, well_index, first):
+    """
+    狗腿严重度连续超过阈值的井段
+    """
+    above = dls > threshold
+    begin = np.flatnonzero(above & (first | ~np.r_[False, above[:-1]]))
+    end = np.flatnonzero(above & np.r_[first[1:] | ~above[1:], True])
+    peak = np.maximum.reduceat(dls, begin) if len(begin) else []  # 两段之间的测点都不超过阈值，不影响最大值
+    return [{'well': int(well_index[b]), 'top': float(md[b - 1] if not first[b] else md[b]),
+             'bottom': float(md[e]), 'max_dls': float(p)}
+            for b, e, p in zip(begin, end, peak)]
@@ -0,0 +1,117 @@
+import numpy as np
+from .field import FieldStore
+
+# 查询点所在网格及其周围26个网格
+NEIGHBORS = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1).reshape(-1, 3)
+
+
+def closest_approach(reference, offsets, radius=500.0, step=None, names=None):
+    """
+    防碰扫描：沿参考井井深求与每口邻井的最近距离（井眼中心距）。
+    邻井各测段按外包盒放入边长为radius的均匀网格，每个参考点只与周围27个网格内的测段求距离，
+    全部计算向量化，不逐对比较
+    :param reference: 参考井，Well
+    :param offsets: 邻井，Well的列表或FieldStore
+    :param radius: 扫描半径，超过半径的距离记为inf
+    :param step: 参考井按此井深间隔取点（沿圆弧插值），默认取参考井的测点
+    :param names: 邻井的名字，offsets为FieldStore时取其井名
+    :return: 字典
+        md: 参考点井深数组
+        names: 邻井名
+        distance: (邻井数, 参考点数)数组，各参考点到各邻井的最近距离
+        offset_md: 同形状数组，最近点在邻井上的井深，超出半径为NaN
+        min_distance, min_md, min_offset_md: 各邻井的最近距离及其在参考井、邻井上的井深
+    """
+    if not isinstance(offsets, FieldStore):
+        offsets = FieldStore.from_wells(offsets, names)
+    names = offsets.names
+
+    md_ref = reference.trajectory['md']
+    if step is not None:
+        md_ref = np.unique(np.append(np.arange(md_ref[0], md_ref[-1], step), md_ref[-1]))
+    points = reference.get_points(md_ref)
+    query = np.stack((points['north'], points['east'], points['tvd']), axis=1)
+
+    # 邻井的测段（同一口井相邻两测点间的弦）
+    columns = offsets.columns
+    xyz = np.stack((columns['north'], columns['east'], columns['tvd']), axis=1)
+    well = offsets.well_index
+    segment = np.flatnonzero(well[:-1] == well[1:])
+    p0, p1 = xyz[segment], xyz[segment + 1]
+
+    distance = np.full((len(names), len(md_ref)), np.inf)
+    offset_md = np.full((len(names), len(md_ref)), np.nan)
+    if len(segment) and len(query):
+        q, s = _candidates(query, p0, p1, radius)
+        d, t = _point_segment(query[q], p0[s], p1[s])
+        near = d <= radius
+        q, s, d, t = q[near], s[near], d[near], t[near]
+        w = well[segment[s]]
+
+        # 每个(参考点, 邻井)取最近的测段
+        order = np.lexsort((d, q, w))
+        key = w[order] * len(md_ref) + q[order]
+        first = order[np.r_[True, key[1:] != key[:-1]]]
+        distance[w[first], q[first]] = d[first]
+        md0 = columns['md'][segment[s[first]]]
+        md1 = columns['md'][segment[s[first]] + 1]
+        offset_md[w[first], q[first]] = md0 + t[first] * (md1 - md0)
+
+    nearest = np.argmin(distance, axis=1)
+    rows = np.arange(len(names))
+    found = np.isfinite(distance[rows, nearest])
+    return {'md': md_ref, 'names': names, 'distance': distance, 'offset_md': offset_md,
+            'min_distance': distance[rows, nearest],
+            'min_md': np.where(found, md_ref[nearest], np.nan),
+            'min_offset_md': offset_md[rows, nearest]}
+
+
+def _candidates(query, p0, p1, cell):
+    """
+    均匀网格粗筛：测段外包盒覆盖的每个网格记一次，参考点与其周围27个网格内的测段组成候选对
+    :return: (参考点索引, 测段索引)数组
+    """
+    origin = np.minimum(p0, p1).min(axis=0)
+    low = np.floor((np.minimum(p0, p1) - origin) / cell).astype(np.int64)
+    high = np.floor((np.maximum(p0, p1) - origin) / cell).astype(np.int64)
+    shape = high.max(axis=0) + 1
+
+    # 展开为(网格, 测段)对并按网格编号排序
+    span = high - low + 1
+    count = span.prod(axis=1)
+    owner = np.repeat(np.arange(len(p0)), count)
+    local = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    sy, sz = span[owner, 1], span[owner, 2]
+    cells = low[owner] + np.stack((local // (sy * sz), local // sz % sy, local % sz), axis=1)
+    keys = _cell_keys(cells, shape)
+    order = np.argsort(keys, kind='stable')
+    keys, owner = keys[order], owner[order]
+
+    # 参考点周围的网格，超出网格范围的没有测段
+    near = (np.floor((query - origin) / cell).astype(np.int64)[:, None, :] + NEIGHBORS).reshape(-1, 3)
+    valid = ((near >= 0) & (near < shape)).all(axis=1)
+    point = np.repeat(np.arange(len(query)), len(NEIGHBORS))[valid]
+    near_keys = _cell_keys(near[valid], shape)
+    left = np.searchsorted(keys, near_keys, side='left')
+    found = np.searchsorted(keys, near_keys, side='right') - left
+
+    pairs = np.repeat(left, found) + np.arange(found.sum()) - np.repeat(np.cumsum(found) - found, found)
+    return np.repeat(point, found), owner[pairs]
+
+
+def _cell_keys(cells, shape):
+    return (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+
+
+def _point_segment(points, p0, p1):
+    """
+    点到线段的距离
+    :return: (距离, 最近点在线段上的位置0~1)
+    """
+    d = p1 - p0
+    length2 = np.einsum('ij,ij->i', d, d)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.einsum('ij,ij->i', points - p0, d) / length2
+    t = np.clip(np.nan_to_num(t), 0, 1)
+    closest = p0 + t[:, None] * d
+    return np.linalg.norm(points - closest, axis=1), t
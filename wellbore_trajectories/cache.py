@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import numpy as np
+from .trajectory import Trajectory, FLOAT_COLUMNS
+from .well import Well
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'wellbore_trajectories')
+CACHE_VERSION = 2  # 缓存格式或轨迹算法改变时加一，旧缓存自动失效
+
+
+def cache_key(path, options):
+    """
+    由文件内容的哈希值与读取参数生成缓存键
+    :param path: 轨迹文件
+    :param options: 读取参数（字典），如set_start、change_azimuth、set_info、inner_points
+    :return: 十六进制字符串
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps([CACHE_VERSION, options], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def read_cache(cache_dir, key):
+    """
+    读取缓存的轨迹，各列以写时复制的内存映射方式打开，不读入内存；有测斜质量检查结果时恢复为well.qc_flags
+    :return: Well，缓存不存在时为None
+    """
+    base = os.path.join(cache_dir, key)
+    try:
+        with open(base + '.json') as f:
+            info = json.load(f)
+        columns = np.load(base + '.npy', mmap_mode='c')
+        codes = np.load(base + '.codes.npy', mmap_mode='c')
+        qc_flags = np.load(base + '.qc.npy') if os.path.exists(base + '.qc.npy') else None
+    except (OSError, ValueError):
+        return None
+
+    trajectory = Trajectory(section_type=codes[0], point_type=codes[1], dls_resolution=info['dlsResolution'],
+                            **dict(zip(FLOAT_COLUMNS, columns)))
+    well = Well({'trajectory': trajectory, 'info': info})
+    if qc_flags is not None:
+        well.qc_flags = qc_flags
+    return well
+
+
+def write_cache(cache_dir, key, well):
+    """
+    将轨迹写入缓存：各列连续存放的.npy，井段/测点类型编码与井眼信息，以及测斜质量检查结果（有时）
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    base = os.path.join(cache_dir, key)
+    trajectory = well.trajectory
+    columns = np.stack([trajectory[name] for name in FLOAT_COLUMNS])
+    codes = np.stack((trajectory.section_codes, trajectory.point_codes))
+    arrays = [('.npy', columns), ('.codes.npy', codes)]
+    if getattr(well, 'qc_flags', None) is not None:
+        arrays.append(('.qc.npy', well.qc_flags))
+
+    # 先写临时文件再改名，json最后写入，读取时以它是否存在判断缓存是否完整
+    for suffix, array in arrays:
+        with open(base + suffix + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(base + suffix + '.tmp', base + suffix)
+    with open(base + '.json.tmp', 'w') as f:
+        json.dump(well.info, f)
+    os.replace(base + '.json.tmp', base + '.json')
@@ -1,5 +1,6 @@
 from math import *
 from numpy import pi
+from .min_curvature import md_at_tvd, interp_segments
 
 
 def calc_dogleg(inc1, inc2, azi1, azi2):
@@ -22,8 +23,9 @@ def calc_dogleg(inc1, inc2, azi1, azi2):
     #     if inner_value < -1:
     #         inner_value = -1
     #     dl = acos(inner_value)
-    dl = acos(cos(radians(inc1)) * cos(radians(inc2)) +
-              sin(radians(inc1)) * sin(radians(inc2)) * cos(radians(azi2 - azi1)))
+    inner_value = cos(radians(inc1)) * cos(radians(inc2)) + \
+        sin(radians(inc1)) * sin(radians(inc2)) * cos(radians(azi2 - azi1))
+    dl = acos(min(1.0, max(-1.0, inner_value)))  # 舍入误差可能使其略超出[-1, 1]
 
     return dl
 
@@ -147,6 +149,11 @@ def inner_pt_calcs(inner_point, p1, p2, dl_sv=None, dls_resolution=30):
 
 
 def adjust_azi(azi, azi1, azi2):
+    """
+    旧的逐点插值用：把方位角按±90°逐步调整到两测点方位之间。方位跨过0/360°（如350°→10°）时
+    会把插值方位错调最多90°，坐标也随之偏差数米；插值已改为沿圆弧闭式计算（min_curvature.interp_segments），
+    此函数只为兼容保留
+    """
     limits = sorted([azi1, azi2])
     count = 1
     while not limits[0] <= azi <= limits[1]:
@@ -199,100 +206,58 @@ def interp_pt(md, trajectory):
     """
     使用井深作为输入，获取插值点信息
     :param md: 井深
-    :param trajectory: 测点的列表
+    :param trajectory: Trajectory
     :return: 一个包含所有信息的测点
     """
+    idx, exact = trajectory.locate(md)  # 二分查找p1点和p2点
+    if exact:
+        return trajectory[idx]
+    p1 = trajectory[idx - 1]
+    target = segment_pt(md, trajectory, idx)
+    target['delta'] = get_delta(target, p1)
+    return target
 
-    if md < 0:
-        raise ValueError('MD value must be positive')
-    if md > trajectory[-1]['md']:
-        raise ValueError("MD can't be deeper than deepest trajectory MD")
-
-    # 需要找到正确的p1点和p2点做插值
-    p1 = None
-    p2 = None
-    for idx, point in enumerate(trajectory):
-        if point['md'] < md < trajectory[idx + 1]['md']:
-            p1 = point
-            p2 = trajectory[idx + 1]
-            break
-        elif point['md'] == md:
-            return point
 
-    dl = (md - p1['md']) * p2['dl'] / (p2['md'] - p1['md'])  # 计算距离上测点的狗腿角
-    target = {'md': md, 'dl': dl}
-    target = inner_pt_calcs(target, p1, p2)
-    target['delta'] = get_delta(target, p1)
+def segment_pt(md, trajectory, idx):
+    """
+    由轨迹缓存的测段表（min_curvature.segment_table）闭式求测段内一点，与批量插值结果一致
+    :param md: 井深，位于测点idx - 1与idx之间
+    :param idx: 测段下测点的索引
+    :return: 插值点，距上测点的狗腿角dl按测段内井深比例分配
+    """
+    point = interp_segments(trajectory, [md])
+    target = {key: float(point[key][0]) for key in ('md', 'inc', 'azi', 'tvd', 'north', 'east', 'dl')}
+    target['dls'] = calc_dls(target, md - trajectory['md'][idx - 1])
+    target['pointType'] = 'interpolated'
+    target['sectionType'] = trajectory[idx]['sectionType']
     return target
 
 
 def scan_tvd(tvd, trajectory):
-    if tvd < 0:
-        raise ValueError('TVD value must be positive')
-    if tvd > max([p['tvd'] for p in trajectory]):
-        raise ValueError("TVD value can't be deeper than deepest trajectory TVD")
-
-    p1 = None
-    p2 = None
-    for idx, point in enumerate(trajectory):
-        if point['tvd'] < tvd:
-            if idx < len(trajectory) - 1 and round(tvd, 2) < round(trajectory[idx + 1]['tvd'], 2):
-                p1 = point
-                p2 = trajectory[idx + 1]
-                break
-        elif round(point['tvd'], 2) == round(tvd, 2):
-            return point
-
-    if p2['sectionType'] == 'vertical':
-        return interp_pt(p1['md'] + tvd - p1['tvd'], trajectory)
-
-    # 应用二分法
-    new_point = interp_pt((p1['md'] + p2['md']) / 2, trajectory)
-    a = p1['md']
-    b = p2['md']
-    while round(tvd, 2) != round(new_point['tvd'], 2):
-        new_md = (a + b) / 2
-        new_point = interp_pt(new_md, trajectory)
-        if new_point['tvd'] < tvd:
-            a = new_md
-        else:
-            b = new_md
-
-    return new_point
+    md = md_at_tvd(trajectory, [tvd])[0]  # 垂深索引加圆弧闭式求解
+    return interp_pt(md, trajectory)
 
 
 def interp_pt_any(md, trajectory):
-    if md < 0:
-        raise ValueError('MD value must be positive')
-    if md > trajectory[-1]['md']:
-        raise ValueError("MD can't be deeper than deepest trajectory MD")
-
-    # 需要找到正确的p1点和p2点做插值
-    p1 = None
-    p2 = None
-    inter_idex = None  # 插入地点的索引
-    for idx, point in enumerate(trajectory):
-        if point['md'] < md < trajectory[idx + 1]['md']:
-            p1 = point
-            p2 = trajectory[idx + 1]
-            inter_idex = idx + 1
-            break
-        elif point['md'] == md:
-            return trajectory
-    dl = (md - p1['md']) * p2['dl'] / (p2['md'] - p1['md'])  # 计算距离上测点的狗腿角
-    target = {'md': md, 'dl': dl}
-    target = inner_pt_calcs(target, p1, p2)
-    p2['dl'] = p2['dl'] - dl  # 改变后一测点的狗腿值，因为中间查了一点
-    trajectory.insert(inter_idex, target)  # 在原数据内插入此点
-
-    for idx, point in enumerate(trajectory):
-        if idx > 0:
-            point['delta'] = get_delta(point, trajectory[idx - 1])
-        else:
-            point['delta'] = get_delta(point)
+    insert_pt(md, trajectory)
     return trajectory
 
 
+def insert_pt(md, trajectory):
+    """
+    在轨迹中插入给定井深处的插值点，并改变后一测点的狗腿角
+    :return: 该点在轨迹中的索引
+    """
+    idx, exact = trajectory.locate(md)  # 二分查找插入地点的索引
+    if exact:
+        return idx
+    target = segment_pt(md, trajectory, idx)
+    p2 = trajectory[idx]
+    p2['dl'] = p2['dl'] - target['dl']  # 改变后一测点的狗腿值，因为中间查了一点
+    trajectory.insert(idx, target)  # 在原数据内插入此点，增量由Trajectory重新计算
+    return idx
+
+
 def get_delta(p2, p1=None):
     if not p1:
         return {'md': 0, 'tvd': 0, 'inc': 0, 'azi': 0, 'dl': 0, 'dls': 0, 'north': 0, 'east': 0}
@@ -304,91 +269,20 @@ def get_delta(p2, p1=None):
 
 
 def scan_tvd_any(tvd, trajectory):
-    if tvd < 0:
-        raise ValueError('TVD value must be positive')
-    if tvd > max([p['tvd'] for p in trajectory]):
-        raise ValueError("TVD value can't be deeper than deepest trajectory TVD")
-    p1 = None
-    p2 = None
-    for idx, point in enumerate(trajectory):
-        if point['tvd'] < tvd:
-            if idx < len(trajectory) - 1 and round(tvd, 2) < round(trajectory[idx + 1]['tvd'], 2):
-                p1 = point
-                p2 = trajectory[idx + 1]
-                break
-        elif round(point['tvd'], 2) == round(tvd, 2):
-            return trajectory
-    # 应用二分法
-    new_point = interp_pt((p1['md'] + p2['md']) / 2, trajectory)
-    a = p1['md']
-    b = p2['md']
-    while round(tvd, 2) != round(new_point['tvd'], 2):
-        new_md = (a + b) / 2
-        new_point = interp_pt(new_md, trajectory)
-        if new_point['tvd'] < tvd:
-            a = new_md
-        else:
-            b = new_md
-    interp_pt_any(new_point['md'], trajectory)
-    return trajectory
+    md = md_at_tvd(trajectory, [tvd])[0]
+    return interp_pt_any(md, trajectory)
 
 
 def get_pt_any(md, trajectory):
-    if md < 0:
-        raise ValueError('MD value must be positive')
-    if md > trajectory[-1]['md']:
-        raise ValueError("MD can't be deeper than deepest trajectory MD")
-
-    # 需要找到正确的p1点和p2点做插值
-    p1 = None
-    p2 = None
-    inter_idex = None  # 插入地点的索引
-    for idx, point in enumerate(trajectory):
-        if point['md'] < md < trajectory[idx + 1]['md']:
-            p1 = point
-            p2 = trajectory[idx + 1]
-            inter_idex = idx + 1
-            break
-        elif point['md'] == md:
-            return point
-    dl = (md - p1['md']) * p2['dl'] / (p2['md'] - p1['md'])  # 计算距离上测点的狗腿角
-    target = {'md': md, 'dl': dl}
-    target = inner_pt_calcs(target, p1, p2)
-    p2['dl'] = p2['dl'] - dl  # 改变后一测点的狗腿值，因为中间查了一点
-    trajectory.insert(inter_idex, target)  # 在原数据内插入此点
-
-    for idx, point in enumerate(trajectory):
-        if idx > 0:
-            point['delta'] = get_delta(point, trajectory[idx - 1])
-        else:
-            point['delta'] = get_delta(point)
-    return target
+    idx, exact = trajectory.locate(md)
+    if exact:
+        return trajectory[idx]
+    return dict(trajectory[insert_pt(md, trajectory)])
 
 
 def get_tvd_any(tvd, trajectory):
-    if tvd < 0:
-        raise ValueError('TVD value must be positive')
-    if tvd > max([p['tvd'] for p in trajectory]):
-        raise ValueError("TVD value can't be deeper than deepest trajectory TVD")
-    p1 = None
-    p2 = None
-    for idx, point in enumerate(trajectory):
-        if point['tvd'] < tvd:
-            if idx < len(trajectory) - 1 and round(tvd, 2) < round(trajectory[idx + 1]['tvd'], 2):
-                p1 = point
-                p2 = trajectory[idx + 1]
-                break
-        elif round(point['tvd'], 2) == round(tvd, 2):
-            return point
-    # 应用二分法
-    new_point = interp_pt((p1['md'] + p2['md']) / 2, trajectory)
-    a = p1['md']
-    b = p2['md']
-    while round(tvd, 2) != round(new_point['tvd'], 2):
-        new_md = (a + b) / 2
-        new_point = interp_pt(new_md, trajectory)
-        if new_point['tvd'] < tvd:
-            a = new_md
-        else:
-            b = new_md
-    return interp_pt_any(new_point['md'], trajectory)
+    md = md_at_tvd(trajectory, [tvd])[0]
+    idx, exact = trajectory.locate(md)
+    if exact:  # 与测点重合时返回该测点，否则插入插值点并返回轨迹
+        return trajectory[idx]
+    return interp_pt_any(md, trajectory)
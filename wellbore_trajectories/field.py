@@ -0,0 +1,233 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from .trajectory import Trajectory, FLOAT_COLUMNS, SECTION_TYPES, POINT_TYPES
+from .well import FrozenWell
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    PYARROW = True
+except ImportError:
+    PYARROW = False
+
+CODE_COLUMNS = ('sectionType', 'pointType')  # 以int8编码存储的列
+WELLS_FILE = '_wells.json'  # Parquet目录中各井的名字、井眼信息与范围
+
+
+class FieldStore(object):
+    def __init__(self, columns, names, offsets, infos):
+        """
+        一个油田全部井的列式存储：所有测点按井依次连接成一张表，offsets[k]:offsets[k + 1]为第k口井的测点
+        :param columns: 字典，FLOAT_COLUMNS各列与井段/测点类型编码列，长度为全部测点数
+        :param names: 各井的名字
+        :param offsets: 各井第一个测点的位置，长度为井数 + 1
+        :param infos: 各井的井眼信息（字典）
+        """
+        self.columns = columns
+        self.names = list(names)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.infos = list(infos)
+        self._index = {name: k for k, name in enumerate(self.names)}
+
+    @classmethod
+    def from_wells(cls, wells, names=None):
+        """
+        由一组Well构造
+        :param wells: Well的列表
+        :param names: 各井的名字，默认为'well 1'、'well 2'……
+        """
+        if names is None:
+            names = ['well ' + str(idx + 1) for idx in range(len(wells))]
+        trajectories = [well.trajectory for well in wells]
+        columns = {key: np.concatenate([t[key] for t in trajectories]) for key in FLOAT_COLUMNS}
+        columns['sectionType'] = np.concatenate([t.section_codes for t in trajectories])
+        columns['pointType'] = np.concatenate([t.point_codes for t in trajectories])
+        offsets = np.zeros(len(wells) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in trajectories], out=offsets[1:])
+        return cls(columns, names, offsets, [dict(well.info) for well in wells])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    @property
+    def npoints(self):
+        return int(self.offsets[-1])
+
+    @property
+    def well_index(self):
+        """
+        每个测点所属井的序号
+        """
+        return np.repeat(np.arange(len(self.names)), np.diff(self.offsets))
+
+    def well(self, name):
+        """
+        取出一口井，轨迹各列是存储的视图，不复制
+        :param name: 井名
+        :return: FrozenWell
+        """
+        k = self._index[name]
+        start, stop = self.offsets[k], self.offsets[k + 1]
+        info = self.infos[k]
+        columns = {key: self.columns[key][start:stop] for key in FLOAT_COLUMNS}
+        trajectory = Trajectory(section_type=self.columns['sectionType'][start:stop],
+                                point_type=self.columns['pointType'][start:stop],
+                                dls_resolution=info.get('dlsResolution', 30), **columns)
+        return FrozenWell({'trajectory': trajectory, 'info': dict(info)})
+
+    def wells(self):
+        return [self.well(name) for name in self.names]
+
+    def select(self, wells=None, md=None, tvd=None, bbox=None):
+        """
+        按井、井深范围、垂深范围与平面范围筛选测点
+        :param wells: 井名的列表，None为全部井
+        :param md: (最小井深, 最大井深)
+        :param tvd: (最小垂深, 最大垂深)
+        :param bbox: (最小北坐标, 最小东坐标, 最大北坐标, 最大东坐标)
+        :return: 新的FieldStore，只含有满足条件测点的井
+        """
+        mask = _station_mask(self.columns, md, tvd, bbox)
+        if wells is not None:
+            selected = np.zeros(len(self.names), dtype=bool)
+            selected[[self._index[name] for name in wells]] = True
+            mask &= selected[self.well_index]
+        return self._subset(mask)
+
+    def bounds(self):
+        """
+        各井的井深、垂深、北坐标、东坐标范围
+        :return: 字典，参数 -> (n, 2)数组，每行为一口井的(最小值, 最大值)，没有测点的井为NaN
+        """
+        starts = self.offsets[:-1]
+        empty = starts == self.offsets[1:]
+        starts = np.minimum(starts, max(self.npoints - 1, 0))
+        result = {}
+        for key in ('md', 'tvd', 'north', 'east'):
+            values = self.columns[key]
+            if not len(values):
+                result[key] = np.full((len(self.names), 2), np.nan)
+                continue
+            low = np.minimum.reduceat(values, starts)
+            high = np.maximum.reduceat(values, starts)
+            result[key] = np.where(empty[:, None], np.nan, np.stack((low, high), axis=1))
+        return result
+
+    def to_frame(self):
+        """
+        转为DataFrame，well列为井名，可直接用于画多口井
+        """
+        data = {'well': np.array(self.names, dtype=object)[self.well_index]}
+        data.update({key: self.columns[key] for key in FLOAT_COLUMNS})
+        data['sectionType'] = np.array(SECTION_TYPES, dtype=object)[self.columns['sectionType']]
+        data['pointType'] = np.array(POINT_TYPES, dtype=object)[self.columns['pointType']]
+        return pd.DataFrame(data)
+
+    def write(self, path):
+        """
+        按井分区写为Parquet数据集（path/well=k/*.parquet），各井的名字、井眼信息与范围写入path/_wells.json；
+        path中已有的分区先全部删除（重写井数更少的数据集时不留下旧井的分区），目录中的其他文件不动
+        """
+        assert PYARROW, "Please install pyarrow"
+        if os.path.isdir(path):
+            for entry in os.listdir(path):
+                if entry.startswith('well=') and os.path.isdir(os.path.join(path, entry)):
+                    shutil.rmtree(os.path.join(path, entry))
+        data = {'well': self.well_index.astype(np.int32)}
+        data.update(self.columns)
+        table = pa.table(data)
+        partitioning = ds.partitioning(pa.schema([('well', pa.int32())]), flavor='hive')
+        ds.write_dataset(table, path, format='parquet', partitioning=partitioning,
+                         existing_data_behavior='overwrite_or_ignore')
+
+        bounds = self.bounds()
+        wells = [{'name': name, 'info': info, 'npoints': int(n),
+                  'bounds': {key: [None if np.isnan(v) else float(v) for v in bounds[key][k]] for key in bounds}}
+                 for k, (name, info, n) in enumerate(zip(self.names, self.infos, np.diff(self.offsets)))]
+        with open(os.path.join(path, WELLS_FILE), 'w') as f:
+            json.dump(wells, f, default=str)
+
+    @classmethod
+    def read(cls, path, wells=None, md=None, tvd=None, bbox=None):
+        """
+        读取write写出的Parquet数据集，筛选条件下推：先按各井的范围排除整口井（不读取其分区），
+        其余条件交给pyarrow按行组统计信息跳过不相关的数据
+        :param wells, md, tvd, bbox: 同select
+        :return: FieldStore，只含有满足条件测点的井
+        """
+        assert PYARROW, "Please install pyarrow"
+        with open(os.path.join(path, WELLS_FILE)) as f:
+            meta = json.load(f)
+
+        candidates = []
+        for k, well in enumerate(meta):
+            if wells is not None and well['name'] not in wells:
+                continue
+            if _overlaps(well['bounds'], md, tvd, bbox):
+                candidates.append(k)
+
+        expression = ds.field('well').isin(candidates)
+        for key, limits in _ranges(md, tvd, bbox):
+            expression &= (ds.field(key) >= limits[0]) & (ds.field(key) <= limits[1])
+        dataset = ds.dataset(path, format='parquet', partitioning='hive',
+                             exclude_invalid_files=True, ignore_prefixes=['.', '_'])
+        table = dataset.to_table(columns=['well', 'md'] + list(FLOAT_COLUMNS[1:]) + list(CODE_COLUMNS),
+                                 filter=expression)
+
+        well = table.column('well').to_numpy()
+        order = np.lexsort((table.column('md').to_numpy(), well))  # 分区读取的顺序不定，按井、井深排序
+        well = well[order]
+        columns = {key: table.column(key).to_numpy()[order] for key in FLOAT_COLUMNS}
+        for key in CODE_COLUMNS:
+            columns[key] = table.column(key).to_numpy()[order].astype(np.int8)
+
+        present = np.unique(well)
+        offsets = np.searchsorted(well, np.append(present, np.iinfo(np.int32).max))
+        return cls(columns, [meta[k]['name'] for k in present], offsets, [meta[k]['info'] for k in present])
+
+    def _subset(self, mask):
+        counts = np.bincount(self.well_index[mask], minlength=len(self.names))
+        kept = np.flatnonzero(counts)
+        offsets = np.zeros(len(kept) + 1, dtype=np.int64)
+        np.cumsum(counts[kept], out=offsets[1:])
+        columns = {key: values[mask] for key, values in self.columns.items()}
+        return FieldStore(columns, [self.names[k] for k in kept], offsets, [self.infos[k] for k in kept])
+
+
+def _ranges(md=None, tvd=None, bbox=None):
+    """
+    筛选条件转为(列名, (最小值, 最大值))的列表
+    """
+    ranges = []
+    if md is not None:
+        ranges.append(('md', md))
+    if tvd is not None:
+        ranges.append(('tvd', tvd))
+    if bbox is not None:
+        ranges.append(('north', (bbox[0], bbox[2])))
+        ranges.append(('east', (bbox[1], bbox[3])))
+    return ranges
+
+
+def _station_mask(columns, md=None, tvd=None, bbox=None):
+    mask = np.ones(len(columns['md']), dtype=bool)
+    for key, limits in _ranges(md, tvd, bbox):
+        mask &= (columns[key] >= limits[0]) & (columns[key] <= limits[1])
+    return mask
+
+
+def _overlaps(bounds, md=None, tvd=None, bbox=None):
+    """
+    一口井的范围与筛选条件是否可能有交集
+    """
+    for key, limits in _ranges(md, tvd, bbox):
+        low, high = bounds[key]
+        if low is None or high < limits[0] or low > limits[1]:
+            return False
+    return True
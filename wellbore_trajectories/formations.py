@@ -0,0 +1,128 @@
+import numpy as np
+from .field import FieldStore
+
+
+def formation_crossings(wells, north, east, surfaces, names=None):
+    """
+    求各井穿过各地层面的井深。地层面为同一网格上的垂深，网格内按双线性插值；
+    各测段先在网格线处切开，使每一小段落在一个网格内，小段上井眼垂深与地层面垂深之差是参数的二次式，
+    直接求根。全部井、全部地层面一次向量化计算
+    :param wells: FieldStore、Well的列表或一口Well
+    :param north: 网格北坐标，递增，长度ny
+    :param east: 网格东坐标，递增，长度nx
+    :param surfaces: (地层面数, ny, nx)数组，或地层名 -> (ny, nx)数组的字典；NaN表示该处没有地层面
+    :param names: 地层名，surfaces为数组时默认为0, 1, ...
+    :return: 字典
+        well, surface: 各穿越点所属井、地层面的序号
+        md, tvd, north, east: 穿越点的井深与坐标（测段按弦，即相邻测点间的直线处理，需要更高精度时先resample）
+        wells, names: 井名与地层名
+        first_md: (井数, 地层面数)数组，首次穿过各地层面的井深，未穿过为NaN
+    """
+    if isinstance(surfaces, dict):
+        names = list(surfaces)
+        surfaces = [surfaces[name] for name in names]
+    surfaces = np.asarray(surfaces, dtype=np.float64)
+    if surfaces.ndim == 2:
+        surfaces = surfaces[None]
+    if names is None:
+        names = list(range(len(surfaces)))
+    if not isinstance(wells, FieldStore):
+        wells = FieldStore.from_wells(wells if isinstance(wells, (list, tuple)) else [wells])
+    north = np.asarray(north, dtype=np.float64)
+    east = np.asarray(east, dtype=np.float64)
+
+    columns = wells.columns
+    well_index = wells.well_index
+    segment = np.flatnonzero(well_index[:-1] == well_index[1:])  # 同一口井相邻两测点间的测段
+    start = {key: columns[key][segment] for key in ('md', 'tvd', 'north', 'east')}
+    delta = {key: columns[key][segment + 1] - start[key] for key in start}
+
+    # 测段在网格线处切开：每个测段的断点为0、1以及与南北、东西网格线交点处的参数
+    owner, t = [np.arange(len(segment)), np.arange(len(segment))], [np.zeros(len(segment)), np.ones(len(segment))]
+    for key, axis in (('north', north), ('east', east)):
+        idx, value = _line_crossings(start[key], delta[key], axis)
+        owner.append(idx)
+        t.append(value)
+    owner, t = np.concatenate(owner), np.concatenate(t)
+    order = np.lexsort((t, owner))
+    owner, t = owner[order], t[order]
+    piece = np.flatnonzero((owner[:-1] == owner[1:]) & (t[1:] > t[:-1]))
+    seg, ta, tb = owner[piece], t[piece], t[piece + 1]
+
+    # 小段中点所在网格，网格外的小段没有地层面
+    mid = (ta + tb) / 2
+    n_mid = start['north'][seg] + mid * delta['north'][seg]
+    e_mid = start['east'][seg] + mid * delta['east'][seg]
+    i = np.searchsorted(north, n_mid, side='right') - 1
+    j = np.searchsorted(east, e_mid, side='right') - 1
+    inside = (i >= 0) & (i < len(north) - 1) & (j >= 0) & (j < len(east) - 1)
+    seg, ta, tb, i, j = seg[inside], ta[inside], tb[inside], i[inside], j[inside]
+
+    # 网格内局部坐标u（东）、v（北）是测段参数的线性函数：u = u0 + du * t
+    width = east[j + 1] - east[j]
+    height = north[i + 1] - north[i]
+    u0 = (start['east'][seg] - east[j]) / width
+    du = delta['east'][seg] / width
+    v0 = (start['north'][seg] - north[i]) / height
+    dv = delta['north'][seg] / height
+
+    # 双线性 z = a + b*u + c*v + d*u*v；井眼垂深减地层面垂深 f(t) = A*t^2 + B*t + C，逐地层面一次计算
+    z00, z10 = surfaces[:, i, j], surfaces[:, i, j + 1]
+    z01, z11 = surfaces[:, i + 1, j], surfaces[:, i + 1, j + 1]
+    a, b, c, d = z00, z10 - z00, z01 - z00, z11 - z10 - z01 + z00
+    A = -d * du * dv
+    B = delta['tvd'][seg] - (b * du + c * dv + d * (u0 * dv + v0 * du))
+    C = start['tvd'][seg] - (a + b * u0 + c * v0 + d * u0 * v0)
+    roots = _quadratic_roots(A, B, C)
+    end = segment[seg] + 1
+    last = (end + 1 >= len(well_index)) | (well_index[np.minimum(end + 1, len(well_index) - 1)] != well_index[end])
+    valid = (roots >= ta) & ((roots < tb) | ((roots == 1) & last))  # 断点处的根只记一次，井底测点处的也算
+    valid[1] &= roots[1] != roots[0]  # 重根只记一次
+
+    which, surface, k = np.nonzero(valid)
+    root = roots[which, surface, k]
+    seg = seg[k]
+    result = {'well': well_index[segment[seg]], 'surface': surface}
+    for key in ('md', 'tvd', 'north', 'east'):
+        result[key] = start[key][seg] + root * delta[key][seg]
+    order = np.lexsort((result['md'], result['surface'], result['well']))
+    result = {key: values[order] for key, values in result.items()}
+
+    first_md = np.full((len(wells), len(surfaces)), np.nan)
+    if len(order):
+        key = result['well'] * len(surfaces) + result['surface']
+        first = np.r_[True, key[1:] != key[:-1]]
+        first_md[result['well'][first], result['surface'][first]] = result['md'][first]
+    result.update(wells=wells.names, names=names, first_md=first_md)
+    return result
+
+
+def _line_crossings(start, delta, axis):
+    """
+    各测段与一组网格线的交点
+    :return: (测段索引, 交点处的测段参数)，只含严格在测段内部的交点
+    """
+    low = np.minimum(start, start + delta)
+    high = np.maximum(start, start + delta)
+    first = np.searchsorted(axis, low, side='right')
+    count = np.maximum(np.searchsorted(axis, high, side='left') - first, 0)
+    owner = np.repeat(np.arange(len(start)), count)
+    line = np.repeat(first, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    return owner, (axis[line] - start[owner]) / delta[owner]
+
+
+def _quadratic_roots(A, B, C):
+    """
+    A*t^2 + B*t + C = 0的两个实根（数值稳定的求根公式），A为0时退化为一次方程，无实根处为NaN
+    :return: (2, ...)数组
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        disc = B ** 2 - 4 * A * C
+        sqrt = np.sqrt(np.where(disc >= 0, disc, np.nan))
+        q = -(B + np.copysign(sqrt, B)) / 2
+        linear = np.abs(A) < 1e-12 * (np.abs(B) + np.abs(C) + 1e-300)
+        root1 = np.where(linear, -C / B, q / A)
+        root2 = np.where(linear, np.nan, C / q)
+    root1 = np.where(np.isfinite(root1), root1, np.nan)
+    root2 = np.where(np.isfinite(root2), root2, np.nan)
+    return np.stack((root1, root2))
@@ -0,0 +1,118 @@
+import numpy as np
+
+try:
+    from pyproj import Transformer
+    PYPROJ = True
+except ImportError:
+    PYPROJ = False
+
+WGS84_A = 6378137.0  # WGS84椭球长半轴, m
+WGS84_E2 = 6.69437999014e-3  # WGS84椭球第一偏心率的平方
+FOOT = 0.3048
+
+
+def to_geographic(north, east, lat, lon, units='metric'):
+    """
+    向量化地将相对井口的北、东坐标转为经纬度。有pyproj时用以井口为中心的等距方位投影精确换算；
+    没有pyproj时在井口处用椭球的子午圈、卯酉圈曲率半径一阶展开，距井口1 km误差约0.1 m，3 km约1.5 m
+    :param north, east: 相对井口的北、东坐标数组
+    :param lat, lon: 井口经纬度, °，可以是与north等长的数组（多口井一起换算）
+    :param units: 'metric' (m) 或 'english' (ft)
+    :return: (lat, lon)数组, °
+    """
+    north, east = _meters(north, east, units)
+    if PYPROJ and np.ndim(lat) == 0:
+        transformer = Transformer.from_crs(_local_crs(lat, lon), 'EPSG:4326', always_xy=True)
+        lon_new, lat_new = transformer.transform(east, north)
+        return np.asarray(lat_new), np.asarray(lon_new)
+
+    phi = np.radians(lat)
+    w = 1 - WGS84_E2 * np.sin(phi) ** 2
+    meridian = WGS84_A * (1 - WGS84_E2) / w ** 1.5
+    normal = WGS84_A / np.sqrt(w)
+    return lat + np.degrees(north / meridian), lon + np.degrees(east / (normal * np.cos(phi)))
+
+
+def to_projected(north, east, lat, lon, crs, units='metric'):
+    """
+    向量化地将相对井口的北、东坐标转为投影坐标系的坐标，需要pyproj
+    :param crs: 目标坐标系，如'EPSG:32650'
+    :return: (x, y)数组，投影坐标系的东、北坐标
+    """
+    assert PYPROJ, "Please install pyproj"
+    north, east = _meters(north, east, units)
+    transformer = Transformer.from_crs(_local_crs(lat, lon), crs, always_xy=True)
+    x, y = transformer.transform(east, north)
+    return np.asarray(x), np.asarray(y)
+
+
+def well_coordinates(well, crs=None):
+    """
+    井各测点的经纬度或投影坐标，按井口位置与坐标系缓存在轨迹上，轨迹改变后重新计算
+    :param well: 已用add_location设置井口经纬度的Well
+    :param crs: None时为经纬度，否则为投影坐标系
+    :return: 字典，{'lat', 'lon'}或{'x', 'y'}数组
+    """
+    location = well.info.get('location')
+    if location is None:
+        raise ValueError('Well location is not set, use add_location first')
+    lat, lon = location['lat'], location['lon']
+    units = well.info.get('units', 'metric')
+
+    def calc(trajectory):
+        north = trajectory['north'] - trajectory['north'][0]  # 井口即第一个测点
+        east = trajectory['east'] - trajectory['east'][0]
+        if crs is None:
+            return dict(zip(('lat', 'lon'), to_geographic(north, east, lat, lon, units)))
+        return dict(zip(('x', 'y'), to_projected(north, east, lat, lon, crs, units)))
+
+    return well.trajectory.cached('geo_{}_{}_{}_{}'.format(lat, lon, crs, units), calc)
+
+
+def field_coordinates(field, crs=None):
+    """
+    一个油田全部测点的经纬度或投影坐标
+    :param field: FieldStore，各井的井眼信息中需有location
+    :param crs: None时为经纬度，否则为投影坐标系
+    :return: 字典，{'lat', 'lon'}或{'x', 'y'}数组，与field.columns等长
+    """
+    if any('location' not in info for info in field.infos):
+        raise ValueError('Well location is not set for every well')
+    counts = np.diff(field.offsets)
+    starts = np.minimum(field.offsets[:-1], max(field.npoints - 1, 0))
+    columns = field.columns
+    north = columns['north'] - np.repeat(columns['north'][starts], counts)
+    east = columns['east'] - np.repeat(columns['east'][starts], counts)
+    scale = np.repeat([FOOT if info.get('units') == 'english' else 1.0 for info in field.infos], counts)
+    lat = np.repeat([info['location']['lat'] for info in field.infos], counts)
+    lon = np.repeat([info['location']['lon'] for info in field.infos], counts)
+
+    if crs is None and not PYPROJ:
+        return dict(zip(('lat', 'lon'), to_geographic(north * scale, east * scale, lat, lon)))
+    first, second = np.empty(field.npoints), np.empty(field.npoints)
+    for k in range(len(field.names)):  # 每口井一个以井口为中心的投影，井内向量化
+        if not counts[k]:
+            continue
+        part = slice(field.offsets[k], field.offsets[k + 1])
+        args = (north[part] * scale[part], east[part] * scale[part], lat[part][0], lon[part][0])
+        if crs is None:
+            first[part], second[part] = to_geographic(*args)
+        else:
+            first[part], second[part] = to_projected(*args, crs)
+    keys = ('lat', 'lon') if crs is None else ('x', 'y')
+    return dict(zip(keys, (first, second)))
+
+
+def _meters(north, east, units):
+    north = np.asarray(north, dtype=np.float64)
+    east = np.asarray(east, dtype=np.float64)
+    if units == 'english':
+        return north * FOOT, east * FOOT
+    return north, east
+
+
+def _local_crs(lat, lon):
+    """
+    以井口为中心的等距方位投影，x、y即相对井口的东、北坐标(m)
+    """
+    return '+proj=aeqd +lat_0={} +lon_0={} +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs'.format(lat, lon)
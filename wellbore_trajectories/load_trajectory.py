@@ -1,7 +1,23 @@
-from .well import Well, define_section
+import os
+from functools import partial
+from operator import itemgetter
+from .well import Well
+import numpy as np
 import pandas as pd
-from .equations import *
-from numpy import linspace
+from .min_curvature import min_curvature, calc_dogleg_array, coordinate_residuals
+from .trajectory import Trajectory
+from .cache import DEFAULT_CACHE_DIR, cache_key, read_cache, write_cache
+from .qc import survey_flags, clean_mask, check_survey_quality, DROP
+
+try:
+    import openpyxl
+    OPENPYXL = True
+except ImportError:
+    OPENPYXL = False
+
+SURVEY_KEYS = ('md', 'inc', 'azi')  # 测斜数据必需的列
+TRUSTED_KEYS = SURVEY_KEYS + ('tvd', 'north', 'east')  # 采用已有坐标时还需要的列
+
 
 def load(data, **kwargs):
     """
@@ -16,24 +32,280 @@ def load(data, **kwargs):
             dict, {'dlsResolution', 'wellType': 'onshore'|'offshore', 'units': 'metric'|'english'}.
         inner_pts: num
             俩测点间的插值点个数
+        chunksize: int, None
+            CSV文件分块读取的行数，设置后逐块计算轨迹，内存占用只与块大小有关
+        cache_dir: str, True, None
+            轨迹缓存目录（True为默认目录），以文件内容与以上参数为键，未改变的文件直接以内存映射读取缓存
+        trusted_coordinates: bool
+            为True时直接采用数据中的垂深、北坐标、东坐标，只向量化地计算狗腿角，不再用最小曲率法积分；
+            此时不分块读取
+        check_every: int, None
+            采用已有坐标时，每隔check_every个测段用最小曲率法抽查一次，不一致时抛出ValueError
+        check_tolerance: float
+            抽查允许的坐标增量偏差，默认0.1 m
+        qc: 'clean', 'reject', None
+            计算轨迹前检查测斜数据：'clean'去掉有qc_drop中各项问题的测点并修正方位角，
+            'reject'有这些问题时抛出ValueError；检查在去掉缺失行之前进行，结果（与原数据各行一一对应的标志）
+            保存为well.qc_flags。采用已有坐标时清洗同样去掉对应的坐标；
+            检查要与上一测点比较，不能与chunksize一起使用（抛出ValueError）
+        qc_limits: dict, None
+            检查的阈值，如{'dls': 20, 'inc_jump': 10, 'azi_jump': 30}，见qc.DEFAULT_LIMITS
+        qc_drop: tuple, None
+            'clean'去掉、'reject'拒绝的检查项，默认qc.DROP（缺失、井深不单调、重复、井斜角越界），
+            如要拒绝狗腿严重度过大的数据可加上'dls'、'inc_jump'、'azi_jump'，各项见qc.CHECKS
     :return:一个Well类
     """
+    cache_dir = kwargs.pop('cache_dir', None)
+    if cache_dir and _file_type(data) is not None:
+        if cache_dir is True:
+            cache_dir = DEFAULT_CACHE_DIR
+        options = {key: kwargs.get(key) for key in ('set_start', 'change_azimuth', 'set_info', 'inner_points',
+                                                    'trusted_coordinates', 'check_every', 'check_tolerance',
+                                                    'qc', 'qc_limits', 'qc_drop')}
+        key = cache_key(data, options)
+        well = read_cache(cache_dir, key)
+        if well is None:
+            well = load(data, **kwargs)
+            try:
+                write_cache(cache_dir, key, well)
+            except OSError:  # 缓存只是加速，目录不可写或磁盘已满时照常返回读取结果
+                pass
+        elif not _streamed(data, kwargs):  # 与不用缓存时一样保留原始数据，第一次访问时才读原文件
+            well._base_reader = partial(_read_table, data)
+        return well
+
     # 参数设置
     set_start = kwargs.get('set_start', None)  # 初始位置
     change_azimuth = kwargs.get('change_azimuth', None)  # 方位改变量
     set_info = kwargs.get('set_info', None)  # 井眼信息读取
     inner_pts = kwargs.get('inner_points', 0)  # 内插点个数
+    chunksize = kwargs.get('chunksize', None)  # CSV分块读取的行数
+    trusted = kwargs.get('trusted_coordinates', False)  # 直接采用已有坐标
 
-    info = {'dlsResolution': 30, 'wellType': 'offshore', 'units': 'metric'}  # 初始信息设置
-
-    initial_point = {'north': 0, 'east': 0}  # 初始点设置
+    info, initial_point = _parse_options(set_info, set_start)
 
     base_data = False  #
     data_initial = None
-    processed = False
 
     # PROCESSING DATA
 
+    file_type = _file_type(data)
+
+    if _streamed(data, kwargs):  # 分块读取，不保留原始数据副本
+        if kwargs.get('qc', None) is not None:
+            raise ValueError('The qc option can not be used with chunksize, use a single-pass read')
+        columns = _concat_chunks(stream_csv(data, chunksize, set_start=initial_point, change_azimuth=change_azimuth))
+        return _make_well(columns, info, inner_pts)
+
+    if isinstance(data, pd.DataFrame):
+        base_data = True
+        data_initial = data.copy()  # 保持最初副本
+    elif file_type is not None:
+        base_data = True
+        data = _read_table(data)  # 用pandas打开表格或csv
+        data_initial = data
+
+    qc, qc_limits, qc_drop = kwargs.get('qc', None), kwargs.get('qc_limits', None), kwargs.get('qc_drop', None)
+    if trusted:
+        arrays, qc_flags = _apply_qc(survey_arrays(data, TRUSTED_KEYS, dropna=False), qc, qc_limits, qc_drop)
+        columns = trusted_survey(*arrays, set_start=initial_point, change_azimuth=change_azimuth)
+        check_every = kwargs.get('check_every', None)
+        if check_every:
+            check_survey(columns, check_every, kwargs.get('check_tolerance', 0.1))
+    else:
+        (md, inc, az), qc_flags = _apply_qc(survey_arrays(data, dropna=False), qc, qc_limits, qc_drop)  # 表头一次解析
+        columns = next(survey_chunks([(md, inc, az)], initial_point, change_azimuth))
+
+    well = _make_well(columns, info, inner_pts)
+    if qc_flags is not None:
+        well.qc_flags = qc_flags
+    if base_data:
+        well._base_data = data_initial
+
+    return well
+
+
+def load_workbook(path, **kwargs):
+    """
+    读取一个工作簿中的多口井，每个工作表一口井。以只读流式方式打开一次工作簿，
+    每个工作表自动寻找表头行，测点直接读入数组，不为工作表建立DataFrame
+    :param path: excel文件
+    :param kwargs: set_start、change_azimuth、set_info、inner_points、qc、qc_limits、qc_drop，同load，对每口井都适用
+    :return: 字典，工作表名 -> Well，找不到井深、井斜角、方位角表头的工作表忽略
+    """
+    assert OPENPYXL, "Please install openpyxl"
+    info, initial_point = _parse_options(kwargs.get('set_info', None), kwargs.get('set_start', None))
+    wells = {}
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            index = _find_header(rows)
+            if index is None:
+                continue
+            getter = itemgetter(*index)
+            values = list(zip(*(getter(row) for row in rows if len(row) > max(index))))  # 剩余行即测点
+            if not values:
+                continue
+            (md, inc, az), qc_flags = _apply_qc(survey_arrays(values, dropna=False), kwargs.get('qc', None),
+                                                kwargs.get('qc_limits', None), kwargs.get('qc_drop', None))
+            columns = next(survey_chunks([(md, inc, az)], initial_point, kwargs.get('change_azimuth', None)))
+            wells[sheet.title] = _make_well(columns, dict(info), kwargs.get('inner_points', 0))
+            if qc_flags is not None:
+                wells[sheet.title].qc_flags = qc_flags
+    finally:
+        workbook.close()
+
+    return wells
+
+
+def _find_header(rows, max_rows=50):
+    """
+    在工作表前max_rows行中寻找同时含有井深、井斜角、方位角的表头行
+    :param rows: 行的迭代器，找到表头后停在表头的下一行
+    :return: 井深、井斜角、方位角所在列的索引，找不到时为None
+    """
+    for _, row in zip(range(max_rows), rows):
+        names = ['' if value is None else str(value) for value in row]
+        resolved = resolve_columns(names)
+        if all(key in resolved for key in ('md', 'inc', 'azi')):
+            return [names.index(resolved[key]) for key in ('md', 'inc', 'azi')]
+    return None
+
+
+def stream_csv(path, chunksize=100000, set_start=None, change_azimuth=None):
+    """
+    分块读取CSV测斜数据，每读一块就计算并产出这一块测点的轨迹列，上一块最后一个测点的状态带入下一块
+    :param path: CSV文件
+    :param chunksize: 每块的行数
+    :param set_start: 初始点北坐标东坐标 {'north': 0, 'east': 0}
+    :param change_azimuth: 方位改变量
+    :return: 生成器，每次产出一个字典，包含md、inc、azi、tvd、north、east、dl数组
+    """
+    names = resolve_columns(pd.read_csv(path, nrows=0).columns)  # 只读表头
+    usecols = [names[key] for key in ('md', 'inc', 'azi')]
+
+    def chunks():
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+            yield survey_arrays(chunk)
+
+    return survey_chunks(chunks(), set_start, change_azimuth)
+
+
+def survey_chunks(chunks, set_start=None, change_azimuth=None):
+    """
+    逐块用最小曲率法计算轨迹，第一块前加上井口点
+    :param chunks: 可迭代对象，每个元素为(md, inc, azi)数组
+    :param set_start: 初始点北坐标东坐标 {'north': 0, 'east': 0}
+    :param change_azimuth: 方位改变量
+    :return: 生成器，每次产出一块测点的轨迹列
+    """
+    start = {'north': 0, 'east': 0}
+    if set_start:
+        start.update(set_start)
+    last = {'md': 0.0, 'inc': 0.0, 'azi': 0.0, 'tvd': 0.0, 'north': start['north'], 'east': start['east']}  # 井口点
+    first = True
+
+    for md, inc, az in chunks:
+        md = np.asarray(md, dtype=np.float64)
+        inc = np.asarray(inc, dtype=np.float64)
+        az = np.asarray(az, dtype=np.float64)
+
+        # 方位角改变
+        if change_azimuth is not None:
+            az = az + change_azimuth
+
+        # 接在上一块最后一个测点（第一块为井口点，井深、井斜、方位均为0）之后，井深不大于0的测点忽略
+        keep = md > 0
+        md = np.concatenate(([last['md']], md[keep]))
+        inc = np.concatenate(([last['inc']], inc[keep]))
+        az = np.concatenate(([last['azi']], az[keep]))
+
+        coords = min_curvature(md, inc, az, north=last['north'], east=last['east'], tvd=last['tvd'])
+        columns = {'md': md, 'inc': inc, 'azi': az, **coords}
+        if not first:  # 上一块最后一个测点已经产出
+            columns = {key: values[1:] for key, values in columns.items()}
+        if len(columns['md']):
+            last = {key: columns[key][-1] for key in last}
+        first = False
+        yield columns
+
+
+def trusted_survey(md, inc, az, tvd, north, east, set_start=None, change_azimuth=None):
+    """
+    采用测斜数据中已有的垂深、北坐标、东坐标（相对井口），只向量化地计算各测段的狗腿角
+    :param md, inc, az, tvd, north, east: 测点数组
+    :param set_start: 初始点北坐标东坐标 {'north': 0, 'east': 0}，加到已有的北、东坐标上
+    :param change_azimuth: 方位改变量，北、东坐标随之绕井口旋转
+    :return: 字典，包含md、inc、azi、tvd、north、east、dl数组，第一个测点为井口点
+    """
+    start = {'north': 0, 'east': 0}
+    if set_start:
+        start.update(set_start)
+
+    # 方位改变在加井口点之前，井口点方位与survey_chunks一致为0
+    if change_azimuth is not None:
+        az = az + change_azimuth
+        angle = np.radians(change_azimuth)
+        north, east = north * np.cos(angle) - east * np.sin(angle), north * np.sin(angle) + east * np.cos(angle)
+
+    # 井深不大于0的测点忽略，前面加上井口点
+    keep = md > 0
+    md, inc, az, tvd, north, east = (np.concatenate(([0.0], values[keep])) for values in (md, inc, az, tvd, north, east))
+
+    dl = np.zeros_like(md)
+    dl[1:] = np.degrees(calc_dogleg_array(inc[:-1], inc[1:], az[:-1], az[1:]))
+    return {'md': md, 'inc': inc, 'azi': az, 'tvd': tvd,
+            'north': north + start['north'], 'east': east + start['east'], 'dl': dl}
+
+
+def check_survey(columns, every=1, tolerance=0.1):
+    """
+    抽样检查轨迹列的坐标与最小曲率法是否一致
+    :param columns: 含md、inc、azi、tvd、north、east数组的字典
+    :param every: 抽样间隔
+    :param tolerance: 允许的坐标增量偏差
+    """
+    segment, residual = coordinate_residuals(*(columns[key] for key in TRUSTED_KEYS), every=every)
+    bad = residual > tolerance
+    if bad.any():
+        idx = segment[bad][0]
+        raise ValueError('Survey coordinates are inconsistent with minimum curvature at MD {} '
+                         '(deviation {:.3f}, {} of {} checked segments)'
+                         .format(columns['md'][idx], residual[bad][0], int(bad.sum()), len(segment)))
+
+
+def _apply_qc(arrays, qc=None, limits=None, drop=None):
+    """
+    按qc参数检查、清洗测斜数据，最后去掉仍有缺失值的行
+    :param arrays: 未去掉缺失行的(md, inc, az, ...)，其后的数组（如已有坐标）清洗时与测点一起去掉
+    :param drop: 'clean'去掉、'reject'拒绝的检查项，默认qc.DROP
+    :return: (arrays, flags)，flags与原始各行一一对应；qc为None时不检查，flags为None
+    """
+    if qc is None:
+        return drop_missing(arrays), None
+    md, inc, az = arrays[:3]
+    limits = limits or {}
+    drop = DROP if drop is None else drop
+    if qc == 'clean':
+        flags = survey_flags(md, inc, az, **limits)
+        keep = clean_mask(md, flags, drop)
+        return drop_missing(tuple(values[keep] for values in (md, inc, np.mod(az, 360)) + tuple(arrays[3:]))), flags
+    if qc == 'reject':
+        flags = check_survey_quality(md, inc, az, reject=drop, **limits)
+        return drop_missing((md, inc, np.mod(az, 360)) + tuple(arrays[3:])), flags
+    raise ValueError('The qc option "{}" is not recognised'.format(qc))
+
+
+def _parse_options(set_info=None, set_start=None):
+    """
+    井眼信息与初始点，默认值被输入的参数改变
+    :return: (info, initial_point)
+    """
+    info = {'dlsResolution': 30, 'wellType': 'offshore', 'units': 'metric'}  # 初始信息设置
+    initial_point = {'north': 0, 'east': 0}  # 初始点设置
+
     if isinstance(set_info, dict):
         for param in set_info:  # 改变井眼信息的默认值，通过输入的参数
             if param in info:
@@ -44,161 +316,180 @@ def load(data, **kwargs):
             if x in initial_point:
                 initial_point[x] = set_start[x]
 
-    if isinstance(data, pd.DataFrame):
-        base_data = True
-        data_initial = data.copy()  # 保持最初副本
-        data.dropna(axis=1, how='all', inplace=True)  # 按列过滤掉某一全为NAN的列
-        data.dropna(inplace=True)  # 按行过滤掉某一行，只要有一个数据缺失，就过滤掉
-        data = solve_key_similarities(data)
-        data = data.to_dict('records')
-        processed = True
+    return info, initial_point
 
-    if ".xlsx" in data:
-        base_data = True
-        data = pd.read_excel(data)  # 用pandas打开表格
-        data_initial = data.copy()
-        data.dropna(axis=1, how='all', inplace=True)
-        data.dropna(inplace=True)
-        data = solve_key_similarities(data)
-        data = data.to_dict('records')
-        processed = True
-
-    if ".csv" in data:
-        base_data = True
-        data = pd.read_csv(data)  # 用pandas打开csv
-        data_initial = data.copy()
-        data.dropna(axis=1, how='all', inplace=True)
-        data.dropna(inplace=True)
-        data = solve_key_similarities(data)
-        data = data.to_dict('records')
-        processed = True
-
-    if type(data[0]) is dict:
-        if not processed:
-            data = solve_key_similarities(data)
-        md = [x['md'] for x in data]
-        inc = [x['inc'] for x in data]
-        az = [x['azi'] for x in data]
-    else:  # 如果不是字典的列表，而是列表的列表
-        md, inc, az = data[:3]
 
-        # 处理缺省数据（连上一步，因为没有处理）
-    for x, y in enumerate(md):  # 如果是字符串，那么将值改为数值型
-        if type(y) == str:
-            md[x] = float(y.split(",", 1)[0])
-            inc[x] = float(inc[x].split(",", 1)[0])
-            az[x] = float(az[x].split(",", 1)[0])
+def _file_type(data):
+    """
+    按文件扩展名判断文件类型
+    :return: 'excel'、'csv'，不是文件路径时为None
+    """
+    if not isinstance(data, (str, os.PathLike)):
+        return None
+    suffix = os.path.splitext(os.fspath(data))[1].lower()
+    if suffix in ('.xlsx', '.xlsm', '.xls'):
+        return 'excel'
+    if suffix == '.csv':
+        return 'csv'
+    return None
 
-    # 方位角改变
-    if change_azimuth is not None:
-        for a in range(len(az)):
-            az[a] += change_azimuth
-
-    # 创建轨迹点
-    trajectory = [{'md': 0, 'inc': 0, 'azi': 0, 'dl': 0, 'tvd': 0, 'sectionType': 'vertical', 'pointType': 'survey'}]
-    trajectory[-1].update(initial_point)  # 加上初始设置的北、东坐标
-    inner_pts += 2  # 一个测段最初有两点
-
-    if md[0] != 0:  # 井口设置
-        md = [0] + md
-        inc = [0] + inc
-        az = [0] + az
-
-    for idx, md in enumerate(md):
-        if md > 0:
-            dogleg = calc_dogleg(inc[idx - 1], inc[idx], az[idx - 1], az[idx])
-            point = {'md': md, 'inc': inc[idx], 'azi': az[idx],
-                     'north': calc_north(trajectory[-1]['north'], trajectory[-1]['md'], md,
-                                         trajectory[-1]['inc'], inc[idx],
-                                         trajectory[-1]['azi'], az[idx],
-                                         dogleg),
-                     'east': calc_east(trajectory[-1]['east'], trajectory[-1]['md'], md,
-                                       trajectory[-1]['inc'], inc[idx],
-                                       trajectory[-1]['azi'], az[idx],
-                                       dogleg),
-                     'tvd': calc_tvd(trajectory[-1]['tvd'], trajectory[-1]['md'], md,
-                                     trajectory[-1]['inc'], inc[idx], dogleg),
-                     'dl': degrees(dogleg),
-                     'pointType': 'survey'
-                     }
-            point['sectionType'] = define_section(point, trajectory[-1])
-            p1 = trajectory[-1]
-
-            if inner_pts > 2:
-                dl_unit = point['dl'] / (inner_pts - 1)  # 插值点之间，每小段内狗腿角
-                md_segment = linspace(p1['md'], point['md'], inner_pts)[1:-1]  # 内插点井深
-                count = 1
-                for new_md in md_segment:
-                    dl_new = dl_unit * count  # 插值点离这一段起始点的狗腿角
-                    inner_point = {'md': new_md, 'dl': dl_unit}
-                    inner_pt_calcs(inner_point, p1, point, dl_sv=dl_new, dls_resolution=info['dlsResolution'])
-                    count += 1
-                    trajectory.append(inner_point)
-                point['dl'] = dl_unit
-            trajectory.append(point)
+
+def _streamed(data, kwargs):
+    """
+    是否分块读取CSV
+    """
+    return bool(kwargs.get('chunksize', None)) and _file_type(data) == 'csv' \
+        and not kwargs.get('trusted_coordinates', False)
+
+
+def _read_table(path):
+    """
+    用pandas打开表格或csv
+    """
+    if _file_type(path) == 'excel':
+        return pd.read_excel(path)
+    return pd.read_csv(path)
+
+
+def _concat_chunks(chunks):
+    chunks = list(chunks)
+    if not chunks:  # 文件为空或只有表头时可能一块也没有
+        _check_stations({'md': ()})
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+
+def _check_stations(columns):
+    """
+    除井口点外至少要有一个测点
+    """
+    if len(columns['md']) < 2:
+        raise ValueError('Survey data contains no stations')
+
+
+def _make_well(columns, info, inner_pts=0):
+    _check_stations(columns)
+    trajectory = Trajectory(dls_resolution=info['dlsResolution'], **columns)
     well = Well({'trajectory': trajectory, 'info': info})
-    if base_data:
-        well._base_data = data_initial
 
+    if inner_pts > 0:
+        well = well.resample(n_per_segment=inner_pts)
     return well
 
 
 def solve_key_similarities(data):
-    md_similarities = ['MD', 'md(ft)', 'md(m)', 'MD(m)', 'MD(ft)', 'MD (ft)',
-                       'measureddepth', 'MeasuredDepth',
-                       'measureddepth(m)', 'MeasuredDepth(m)',
-                       'measureddepth(ft)', 'MeasuredDepth(ft)', '井深']
-
-    inc_similarities = ['Inclination', 'inclination', 'Inc', 'Incl', 'incl',
-                        'inclination(°)', 'Inclination(°)', 'Incl(°)', 'Inc°', 'inc°',
-                        'incl(°)', 'Inc(°)', 'inc(°)', 'INC', 'INC(°)', 'INCL',
-                        'INCL(°)', 'Inc(deg)', 'inc(deg)', '井斜角']
-
-    azi_similarities = ['az', 'az(°)',
-                        'Az', 'Az(°)',
-                        'AZ', 'AZ(°)',
-                        'Azi', 'Azi(°)',
-                        'azi(°)', 'Azi°',
-                        'AZI', 'AZI(°)',
-                        'Azimuth', 'Azimuth(°)',
-                        'azimuth', 'azimuth(°)',
-                        'Azi(deg)', 'azi(deg)', '方位角']
-
-    tvd_similarities = ['TVD', 'TVD (m)', 'TVD (ft)', 'TVD(m)', 'TVD(ft)',
-                        'tvd (m)', 'tvd (ft)', 'tvd(m)', 'tvd(ft)']
-
-    north_similarities = ['NORTH', 'NORTH(m)', 'NORTH(ft)',
-                          'North', 'North(m)', 'North(ft)',
-                          'Northing(m)', 'Northing(ft)'
-                          'N/S(m)', 'N/S(ft)',
-                          'Ns(m)', 'Ns(ft)']
-
-    east_similarities = ['EAST', 'EAST(m)', 'EAST(ft)',
-                         'East', 'East(m)', 'East(ft)',
-                         'Easting(m)', 'Easting(ft)'
-                         'E/W(m)', 'E/W(ft)',
-                         'Ew(m)', 'Ew(ft)']
-
-    possible_keys = [md_similarities,
-                     tvd_similarities,
-                     inc_similarities,
-                     azi_similarities,
-                     north_similarities,
-                     east_similarities]
-
-    correct_keys = ['md', 'tvd', 'inc', 'azi', 'north', 'east']
-
-    true_key = 0
-    for i in possible_keys:
-        for x in i:
-            if isinstance(data, pd.DataFrame):
-                data.columns = data.columns.str.replace(' ', '')
-                if x in data.columns:
-                    data.rename(columns={x: correct_keys[true_key]}, inplace=True)
-            else:
-                if x.replace(' ', '') in data[0]:
-                    for point in data:
-                        point[correct_keys[true_key]] = point[x]
-        true_key += 1
-
-    return data
\ No newline at end of file
+    """
+    统一列名（键名）为md、tvd、inc、azi、north、east
+    :param data: DataFrame（列名去掉空格后原地改名）或字典的列表（增加统一的键）
+    """
+    if isinstance(data, pd.DataFrame):
+        data.columns = data.columns.str.replace(' ', '')
+        data.rename(columns={v: k for k, v in resolve_columns(data.columns).items()}, inplace=True)
+    else:
+        for key, name in resolve_columns(data[0].keys()).items():
+            for point in data:
+                point[key] = point[name]
+
+    return data
+
+
+def resolve_columns(columns):
+    """
+    用预编译的别名表一次解析表头
+    :param columns: 列名（键名）
+    :return: 字典，统一列名 -> 原列名，每个统一列名取第一个匹配的列
+    """
+    resolved = {}
+    for name in columns:
+        key = HEADER_ALIASES.get(_normalize_header(name))
+        if key is not None and key not in resolved:
+            resolved[key] = name
+    return resolved
+
+
+def survey_arrays(data, keys=SURVEY_KEYS, dropna=True):
+    """
+    由DataFrame、字典的列表或列表的列表直接取出井深、井斜角、方位角等数组，
+    字符串（如"1234.5,..."取逗号前的部分）统一向量化地转为数值，缺失的测点去掉
+    :param keys: 要取出的统一列名，列表的列表按此顺序排列
+    :param dropna: 为False时保留缺失的测点（NaN），各数组与原数据各行一一对应，用于质量检查
+    :return: 各列数组，默认为(md, inc, azi)
+    """
+    if isinstance(data, pd.DataFrame):
+        names = resolve_columns(data.columns)
+        values = [data[names[key]] for key in keys]
+    elif isinstance(data[0], dict):
+        names = resolve_columns(data[0].keys())
+        values = [[point[names[key]] for point in data] for key in keys]
+    else:  # 如果不是字典的列表，而是列表的列表
+        values = data[:len(keys)]
+
+    arrays = tuple(to_float(v) for v in values)
+    return drop_missing(arrays) if dropna else arrays
+
+
+def drop_missing(arrays):
+    """
+    去掉任一列缺失（NaN）的行
+    """
+    valid = ~np.any([np.isnan(values) for values in arrays], axis=0)
+    return tuple(values[valid] for values in arrays)
+
+
+def to_float(values):
+    """
+    向量化地将一列数值或字符串转为float64数组，不能转换的为NaN
+    """
+    values = pd.Series(values)
+    if values.dtype.kind in 'iufb':
+        return values.to_numpy(dtype=np.float64)
+    text = values.astype(str).str.split(',', n=1).str[0].str.strip()
+    return pd.to_numeric(text, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _normalize_header(name):
+    return str(name).replace(' ', '').lower()
+
+
+MD_SIMILARITIES = ['MD', 'md(ft)', 'md(m)', 'MD(m)', 'MD(ft)', 'MD (ft)',
+                   'measureddepth', 'MeasuredDepth',
+                   'measureddepth(m)', 'MeasuredDepth(m)',
+                   'measureddepth(ft)', 'MeasuredDepth(ft)', '井深']
+
+INC_SIMILARITIES = ['Inclination', 'inclination', 'Inc', 'Incl', 'incl',
+                    'inclination(°)', 'Inclination(°)', 'Incl(°)', 'Inc°', 'inc°',
+                    'incl(°)', 'Inc(°)', 'inc(°)', 'INC', 'INC(°)', 'INCL',
+                    'INCL(°)', 'Inc(deg)', 'inc(deg)', '井斜角']
+
+AZI_SIMILARITIES = ['az', 'az(°)',
+                    'Az', 'Az(°)',
+                    'AZ', 'AZ(°)',
+                    'Azi', 'Azi(°)',
+                    'azi(°)', 'Azi°',
+                    'AZI', 'AZI(°)',
+                    'Azimuth', 'Azimuth(°)',
+                    'azimuth', 'azimuth(°)',
+                    'Azi(deg)', 'azi(deg)', '方位角']
+
+TVD_SIMILARITIES = ['TVD', 'TVD (m)', 'TVD (ft)', 'TVD(m)', 'TVD(ft)',
+                    'tvd (m)', 'tvd (ft)', 'tvd(m)', 'tvd(ft)']
+
+NORTH_SIMILARITIES = ['NORTH', 'NORTH(m)', 'NORTH(ft)',
+                      'North', 'North(m)', 'North(ft)',
+                      'Northing(m)', 'Northing(ft)',
+                      'N/S(m)', 'N/S(ft)',
+                      'Ns(m)', 'Ns(ft)']
+
+EAST_SIMILARITIES = ['EAST', 'EAST(m)', 'EAST(ft)',
+                     'East', 'East(m)', 'East(ft)',
+                     'Easting(m)', 'Easting(ft)',
+                     'E/W(m)', 'E/W(ft)',
+                     'Ew(m)', 'Ew(ft)']
+
+SIMILARITIES = {'md': ['md'] + MD_SIMILARITIES,
+                'tvd': ['tvd'] + TVD_SIMILARITIES,
+                'inc': ['inc'] + INC_SIMILARITIES,
+                'azi': ['azi'] + AZI_SIMILARITIES,
+                'north': ['north'] + NORTH_SIMILARITIES,
+                'east': ['east'] + EAST_SIMILARITIES}
+
+HEADER_ALIASES = {_normalize_header(alias): key for key, aliases in SIMILARITIES.items() for alias in aliases}
@@ -0,0 +1,280 @@
+import numpy as np
+from .trajectory import Trajectory, POINT_TYPES
+
+
+def calc_dogleg_array(inc1, inc2, azi1, azi2):
+    """
+    向量化计算各测段的狗腿角，采用半正矢（haversine）形式，小角度时不损失精度，也不会出现acos越界
+    :param inc1: 上测点井斜角数组, °
+    :param inc2: 下测点井斜角数组, °
+    :param azi1: 上测点方位角数组, °
+    :param azi2: 下测点方位角数组, °
+    :return: 以rad为单位的狗腿角数组
+    """
+    inc1, inc2 = np.radians(inc1), np.radians(inc2)
+    azi1, azi2 = np.radians(azi1), np.radians(azi2)
+    h = np.sin((inc2 - inc1) / 2) ** 2 + np.sin(inc1) * np.sin(inc2) * np.sin((azi2 - azi1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+def calc_rf_array(dogleg, delta_md):
+    """
+    向量化计算最小曲率法的辅助系数，与calc_rf相同：狗腿角为0时为delta_md / 2
+    :param dogleg: 各测段狗腿角数组, rad
+    :param delta_md: 各测段长度数组
+    :return:
+    """
+    dogleg = np.asarray(dogleg, dtype=np.float64)
+    half = dogleg / 2
+    small = half < 1e-4
+    safe = np.where(small, 1, half)
+    factor = np.where(small, 1 + half ** 2 / 3, np.tan(safe) / safe)  # tan(x)/x，x很小时用级数展开
+    return delta_md / 2 * factor
+
+
+def min_curvature(md, inc, azi, north=0, east=0, tvd=0):
+    """
+    最小曲率法一次性计算全部测点的坐标
+    :param md: 井深数组
+    :param inc: 井斜角数组, °
+    :param azi: 方位角数组, °
+    :param north, east, tvd: 第一个测点的北坐标、东坐标、垂深
+    :return: 字典，包含tvd、north、east与dl（各测点与上一测点间的狗腿角, °）数组
+    """
+    md = np.asarray(md, dtype=np.float64)
+    inc = np.asarray(inc, dtype=np.float64)
+    azi = np.asarray(azi, dtype=np.float64)
+    inc_rad = np.radians(inc)
+    azi_rad = np.radians(azi)
+
+    dogleg = calc_dogleg_array(inc[:-1], inc[1:], azi[:-1], azi[1:])
+    rf = calc_rf_array(dogleg, md[1:] - md[:-1])
+
+    sin_inc = np.sin(inc_rad)
+    n = sin_inc * np.cos(azi_rad)  # 单位切向量的北、东、垂直分量
+    e = sin_inc * np.sin(azi_rad)
+    v = np.cos(inc_rad)
+
+    result = {'dl': np.zeros_like(md)}
+    result['dl'][1:] = np.degrees(dogleg)
+    for key, start, comp in (('north', north, n), ('east', east, e), ('tvd', tvd, v)):
+        values = np.empty_like(md)
+        values[0] = start
+        np.cumsum(rf * (comp[:-1] + comp[1:]), out=values[1:])
+        values[1:] += start
+        result[key] = values
+    return result
+
+
+def coordinate_residuals(md, inc, azi, tvd, north, east, every=1):
+    """
+    抽样检查已有坐标与最小曲率法是否一致：每隔every个测段，比较给出的坐标增量与由井斜、方位算出的增量
+    :param md, inc, azi, tvd, north, east: 各测点的井深、井斜角、方位角、垂深、北坐标、东坐标数组
+    :param every: 抽样间隔，1为检查全部测段
+    :return: (segment, residual)，抽样测段下测点的索引，以及两种增量之差的长度
+    """
+    segment = np.arange(1, len(md), max(int(every), 1))
+    i = segment - 1
+    dogleg = calc_dogleg_array(inc[i], inc[segment], azi[i], azi[segment])
+    rf = calc_rf_array(dogleg, md[segment] - md[i])
+    t1 = tangent_vectors(inc[i], azi[i])
+    t2 = tangent_vectors(inc[segment], azi[segment])
+    given = np.stack([values[segment] - values[i] for values in (north, east, tvd)], axis=-1)
+    residual = np.linalg.norm(given - rf[:, None] * (t1 + t2), axis=1)
+    return segment, residual
+
+
+def tangent_vectors(inc, azi):
+    """
+    各测点的单位切向量
+    :param inc: 井斜角数组, °
+    :param azi: 方位角数组, °
+    :return: (n, 3)数组，列依次为北、东、垂直分量
+    """
+    inc_rad = np.radians(inc)
+    azi_rad = np.radians(azi)
+    sin_inc = np.sin(inc_rad)
+    return np.stack((sin_inc * np.cos(azi_rad), sin_inc * np.sin(azi_rad), np.cos(inc_rad)), axis=-1)
+
+
+def segment_table(trajectory):
+    """
+    各测段（测点k到k + 1）的常量表，轨迹不变时只计算一次，缓存在轨迹上（trajectory.cached('segments', ...)），
+    此后任意井深处的插值只需查表与几次乘加
+    :return: 字典
+        tangent: (n, 3)各测点的单位切向量
+        length, theta, sin_theta: (n - 1)各测段的长度、狗腿角(rad)与其正弦（狗腿角很小时为1）
+        cdl: (n)自井口的累计狗腿角, °
+        arc_a, arc_b, arc_scale: (n - 1)圆弧垂深的系数，z(phi) - z1 = arc_scale * (arc_a * cos(phi) + arc_b * sin(phi) - arc_a)
+    """
+    md = trajectory['md']
+    theta = np.radians(trajectory['dl'][1:])
+    tangent = tangent_vectors(trajectory['inc'], trajectory['azi'])
+    length = md[1:] - md[:-1]
+    v1, v2 = tangent[:-1, 2], tangent[1:, 2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = length / theta / np.sin(theta)  # R / sin(theta)
+    return {'tangent': tangent, 'length': length, 'theta': theta,
+            'sin_theta': np.where(theta < 1e-8, 1, np.sin(theta)), 'cdl': np.cumsum(trajectory['dl']),
+            'arc_a': v1 * np.cos(theta) - v2, 'arc_b': v1 * np.sin(theta), 'arc_scale': scale}
+
+
+def interp_segments(trajectory, md):
+    """
+    沿圆弧测段批量插值任意井深处的测点（切向量球面线性插值，坐标用最小曲率法由上测点推出）
+    :param trajectory: Trajectory
+    :param md: 插值点井深数组，需在轨迹范围内
+    :return: 字典，包含md、inc、azi、tvd、north、east数组，
+             以及segment（所在测段上测点的索引）、dl（距上测点的狗腿角, °）、cdl（距井口的累计狗腿角, °）
+    """
+    md = np.asarray(md, dtype=np.float64)
+    md_col = trajectory['md']
+    azi = trajectory['azi']
+    table = trajectory.cached('segments', segment_table)
+
+    i = np.clip(np.searchsorted(md_col, md, side='right') - 1, 0, len(md_col) - 2)
+    j = i + 1
+    frac = (md - md_col[i]) / table['length'][i]
+    theta = table['theta'][i]
+    phi = frac * theta
+
+    # 球面线性插值权重，狗腿角很小时退化为线性插值
+    small = theta < 1e-8
+    sin_theta = table['sin_theta'][i]
+    w1 = np.where(small, 1 - frac, np.sin(theta - phi) / sin_theta)
+    w2 = np.where(small, frac, np.sin(phi) / sin_theta)
+    t1 = table['tangent'][i]
+    t2 = table['tangent'][j]
+    t = w1[:, None] * t1 + w2[:, None] * t2
+    t /= np.linalg.norm(t, axis=1)[:, None]
+
+    horizontal = np.hypot(t[:, 0], t[:, 1])
+    new_inc = np.degrees(np.arctan2(horizontal, t[:, 2]))
+    azi_lin = azi[i] + frac * (azi[j] - azi[i])
+    new_azi = np.degrees(np.arctan2(t[:, 1], t[:, 0]))
+    new_azi = azi_lin + (new_azi - azi_lin + 180) % 360 - 180  # 与测点方位取同一周期，避免0/360跳变
+    new_azi = np.where((azi[i] == azi[j]) | (horizontal < 1e-12), azi[i], new_azi)
+
+    rf = calc_rf_array(phi, md - md_col[i])
+    result = {'md': md, 'inc': new_inc, 'azi': new_azi}
+    for k, key in enumerate(('north', 'east', 'tvd')):
+        result[key] = trajectory[key][i] + rf * (t1[:, k] + t[:, k])
+
+    # 与测点重合时直接取测点的值
+    station = np.where(frac >= 1, j, i)
+    exact = (frac <= 0) | (frac >= 1)
+    for key in ('inc', 'azi', 'north', 'east', 'tvd'):
+        result[key] = np.where(exact, trajectory[key][station], result[key])
+
+    result['segment'] = i
+    result['dl'] = np.degrees(phi)
+    result['cdl'] = table['cdl'][i] + frac * trajectory['dl'][j]
+    return result
+
+
+def merge_points(trajectory, md, keep_stations=True):
+    """
+    将一组井深处的插值点并入轨迹，一次排序合并，测段狗腿角按累计狗腿角重新分配
+    :param trajectory: Trajectory
+    :param md: 新增点的井深数组，与已有测点重合的不重复插入
+    :param keep_stations: 为False时只保留md处的点（与测点重合的保留该测点）以及井口与井底测点，
+                          测段狗腿角由相邻保留点的井斜角、方位角重新计算
+    :return: 新的Trajectory，原轨迹不变
+    """
+    md_col = trajectory['md']
+    requested = np.unique(np.asarray(md, dtype=np.float64))
+    md = requested[~np.isin(requested, md_col)]
+    if md.size and (md[0] < md_col[0] or md[-1] > md_col[-1]):
+        raise ValueError("MD can't be outside the trajectory MD range")
+    new = interp_segments(trajectory, md)
+
+    columns = {}
+    for key in ('md', 'inc', 'azi', 'tvd', 'north', 'east'):
+        columns[key] = np.concatenate((trajectory[key], new[key]))
+    cdl = np.concatenate((trajectory.cached('segments', segment_table)['cdl'], new['cdl']))
+    section = np.concatenate((trajectory.section_codes, trajectory.section_codes[new['segment'] + 1]))
+    point = np.concatenate((trajectory.point_codes, np.full(md.size, POINT_TYPES.index('interpolated'), dtype=np.int8)))
+
+    order = np.argsort(columns['md'], kind='stable')
+    if keep_stations:
+        cdl = cdl[order]
+        dl = np.zeros_like(cdl)
+        dl[1:] = cdl[1:] - cdl[:-1]
+    else:
+        kept = np.ones(len(order), dtype=bool)
+        kept[1:len(md_col) - 1] = np.isin(md_col[1:-1], requested)  # 测点只保留井口、井底与落在md上的
+        order = order[kept[order]]
+        # 去掉测点后相邻两点不在同一圆弧上，累计狗腿角之差不是两点切向的夹角，由井斜角、方位角重新计算
+        inc, azi = columns['inc'][order], columns['azi'][order]
+        dl = np.zeros(len(order))
+        dl[1:] = np.degrees(calc_dogleg_array(inc[:-1], inc[1:], azi[:-1], azi[1:]))
+    return Trajectory(dl=dl, section_type=section[order], point_type=point[order],
+                      dls_resolution=trajectory.dls_resolution,
+                      **{key: values[order] for key, values in columns.items()})
+
+
+def tvd_index(trajectory):
+    """
+    垂深索引：各测点处轨迹（含测段圆弧内部）已达到的最大垂深，单调不减，可用二分查找垂深首次到达的测段
+    """
+    tvd = trajectory['tvd']
+    table = trajectory.cached('segments', segment_table)
+    a, b, scale = table['arc_a'], table['arc_b'], table['arc_scale']
+    v1, v2 = table['tangent'][:-1, 2], table['tangent'][1:, 2]
+    segment_max = np.maximum(tvd[:-1], tvd[1:])
+    apex = (v1 > 0) & (v2 < 0)  # 测段内由下行转为上行，圆弧内部有最低点
+    with np.errstate(invalid='ignore'):
+        segment_max = np.where(apex, np.maximum(segment_max, tvd[:-1] + scale * (np.hypot(a, b) - a)), segment_max)
+    reach = np.empty_like(tvd)
+    reach[0] = tvd[0]
+    np.maximum.accumulate(np.maximum(segment_max, tvd[0]), out=reach[1:])
+    return reach
+
+
+def md_at_tvd(trajectory, tvd):
+    """
+    批量求垂深首次到达处的井深，在圆弧测段上闭式求解
+    :param trajectory: Trajectory
+    :param tvd: 垂深数组
+    :return: 井深数组
+    """
+    tvd = np.asarray(tvd, dtype=np.float64)
+    reach = trajectory.cached('tvd_index', tvd_index)
+    if (tvd < 0).any():
+        raise ValueError('TVD value must be positive')
+    if not (tvd >= reach[0]).all():  # 轨迹可能不从井口开始（如FieldStore按井深截取的井段），NaN也在此拒绝
+        raise ValueError("TVD can't be shallower than shallowest trajectory TVD")
+    if (tvd > reach[-1]).any():
+        raise ValueError("TVD value can't be deeper than deepest trajectory TVD")
+
+    md_col, tvd_col = trajectory['md'], trajectory['tvd']
+    table = trajectory.cached('segments', segment_table)
+    j = np.clip(np.searchsorted(reach, tvd, side='left'), 1, len(md_col) - 1)  # 所在测段的下测点
+    i = j - 1
+    length = table['length'][i]
+    theta = table['theta'][i]
+    a, b, scale = table['arc_a'][i], table['arc_b'][i], table['arc_scale'][i]
+
+    # z - z1 = scale * (a * cos(phi) + b * sin(phi) - a)，即 r * cos(phi - gamma) = c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = a + (tvd - tvd_col[i]) / scale
+        r = np.hypot(a, b)
+        gamma = np.arctan2(b, a)
+        half = np.arccos(np.clip(c / r, -1, 1))
+        roots = np.stack(((gamma - half) % (2 * np.pi), (gamma + half) % (2 * np.pi)))
+        roots = np.where(roots <= theta + 1e-12, roots, np.inf).min(axis=0)
+        s = np.minimum(roots, theta) / theta * length
+        v1 = table['tangent'][i, 2]
+        straight = (tvd - tvd_col[i]) / v1  # 直线段
+    s = np.where((theta < 1e-6) | ~np.isfinite(s), straight, s)
+    md = md_col[i] + np.clip(np.nan_to_num(s), 0, length)
+
+    # 牛顿法修正一步，消除小狗腿角时闭式解的舍入误差
+    point = interp_segments(trajectory, md)
+    v = np.cos(np.radians(point['inc']))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        step = np.where(np.abs(v) > 1e-6, (tvd - point['tvd']) / v, 0)
+    md = np.clip(md + step, md_col[i], md_col[j])
+    md = np.where(np.abs(md - md_col[j]) < 1e-8, md_col[j], md)  # 与测点重合
+    return np.where(tvd_col[i] == tvd, md_col[i], md)
+
@@ -23,7 +23,7 @@ def plot_wellpath(well, **kwargs):
 
     units = well.info['units']  # 单位
 
-    well1 = pd.DataFrame(well.trajectory)
+    well1 = well.df()
     well1["well"] = 1  # 画的第一口井
     result = well1
 
@@ -35,12 +35,12 @@ def plot_wellpath(well, **kwargs):
 
         well_no = 2
         for x in data['add_well']:
-            new_well = pd.DataFrame(x.trajectory)
+            new_well = x.df()
             new_well["well"] = well_no
             wells.append(new_well)
             well_no += 1
 
-        all_wells = well1.append(wells)
+        all_wells = pd.concat([well1] + wells, ignore_index=True)
         result = all_wells
 
     if data['names'] is not None:
@@ -94,7 +94,13 @@ def plot_wellpath(well, **kwargs):
     return fig
 
 def plot_top_view(well, **kwargs):
-    data = {'add_well': None, 'names': None, 'style': None}
+    """
+    画水平投影图
+    Keyword Arguments:
+        geographic: False为相对坐标北、东；True为经纬度；也可以是投影坐标系（如'EPSG:32650'）。
+                    后两者需先用add_location设置各井井口经纬度
+    """
+    data = {'add_well': None, 'names': None, 'style': None, 'geographic': False}
     for key, value in kwargs.items():
         data[key] = value
 
@@ -117,13 +123,30 @@ def plot_top_view(well, **kwargs):
     fig = go.Figure()
 
     for idx, w in enumerate(wells):
+        formats = (':.2f', '')  # 悬停显示纵、横坐标的格式
+        if data['geographic'] is True:
+            coordinates = w.geo_coordinates()
+            x, y, labels = coordinates['lon'], coordinates['lat'], ('Lat', 'Lon')
+            formats = (':.6f', ':.6f')  # 经纬度0.01°约1 km，保留6位小数（约0.1 m）
+        elif data['geographic']:
+            coordinates = w.geo_coordinates(data['geographic'])
+            x, y, labels = coordinates['x'], coordinates['y'], ('Y', 'X')
+        else:
+            x, y, labels = w.trajectory['east'], w.trajectory['north'], ('North', 'East')
         fig.add_trace(go.Scatter(
-            x=[point['east'] for point in w.trajectory],
-            y=[point['north'] for point in w.trajectory],
-            hovertemplate='<b>North</b>: %{y:.2f}<br>' + '<b>East</b>: %{x}<br>',
+            x=x,
+            y=y,
+            hovertemplate='<b>' + labels[0] + '</b>: %{y' + formats[0] + '}<br>' +
+                          '<b>' + labels[1] + '</b>: %{x' + formats[1] + '}<br>',
             showlegend=False, name=data['names'][idx]))
 
-    if units == 'metric':
+    if data['geographic'] is True:
+        fig.update_layout(xaxis_title='Longitude, °',
+                          yaxis_title='Latitude, °')
+    elif data['geographic']:
+        fig.update_layout(xaxis_title='X, ' + str(data['geographic']),
+                          yaxis_title='Y, ' + str(data['geographic']))
+    elif units == 'metric':
         fig.update_layout(xaxis_title='East, m',
                           yaxis_title='North, m')
     else:
@@ -169,8 +192,8 @@ def plot_vs(well, **kwargs):
 
     for idx, w in enumerate(wells):
         fig.add_trace(go.Scatter(
-            x=[point[data['x_axis']] for point in w.trajectory],
-            y=[point[data['y_axis']] for point in w.trajectory],
+            x=w.trajectory[data['x_axis']],
+            y=w.trajectory[data['y_axis']],
             hovertemplate='<b>y</b>: %{y:.2f}<br>' + '<b>x</b>: %{x:.2f}<br>',
             showlegend=False, name=data['names'][idx]))
 
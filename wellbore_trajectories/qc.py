@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from .min_curvature import calc_dogleg_array
+
+# 各项检查，标志位依次为1, 2, 4, ...
+CHECKS = ('missing',     # 井深、井斜角或方位角缺失
+          'md_order',    # 井深不大于上一测点（井深不单调）
+          'duplicate',   # 与上一测点完全相同
+          'inc_range',   # 井斜角不在0~180°
+          'azi_wrap',    # 方位角不在0~360°（可按360°取模修正）
+          'inc_jump',    # 井斜角与上一测点相差过大
+          'azi_jump',    # 方位角（按最短弧）与上一测点相差过大
+          'dls')         # 狗腿严重度超过上限
+FLAGS = {name: np.uint16(1 << bit) for bit, name in enumerate(CHECKS)}
+DROP = ('missing', 'md_order', 'duplicate', 'inc_range')  # 清洗时默认去掉的测点
+DEFAULT_LIMITS = {'inc_jump': 10.0, 'azi_jump': 30.0, 'dls': 20.0, 'dls_resolution': 30}
+
+
+def survey_flags(md, inc, azi, well_index=None, **limits):
+    """
+    向量化的测斜数据质量检查，全部检查都是数组运算
+    :param md, inc, azi: 测点的井深、井斜角、方位角数组，可以是多口井依次连接
+    :param well_index: 各测点所属井的序号，多口井连接时与上一测点的比较不跨井
+    :param limits: inc_jump、azi_jump（°）、dls（°/dls_resolution）与dls_resolution，默认见DEFAULT_LIMITS
+    :return: uint16标志数组，每个测点一个，各位含义见CHECKS
+    """
+    settings = dict(DEFAULT_LIMITS)
+    settings.update(limits)
+    md = np.asarray(md, dtype=np.float64)
+    inc = np.asarray(inc, dtype=np.float64)
+    azi = np.asarray(azi, dtype=np.float64)
+    flags = np.zeros(len(md), dtype=np.uint16)
+
+    missing = np.isnan(md) | np.isnan(inc) | np.isnan(azi)
+    flags[missing] |= FLAGS['missing']
+    with np.errstate(invalid='ignore'):
+        flags[(inc < 0) | (inc > 180)] |= FLAGS['inc_range']
+        flags[(azi < 0) | (azi >= 360)] |= FLAGS['azi_wrap']
+
+    # 与上一个有效测点比较（缺失的测点跳过，不跨井）
+    valid = np.flatnonzero(~missing)
+    prev, cur = valid[:-1], valid[1:]
+    deepest = np.maximum.accumulate(md[valid])[:-1]  # 之前测点的最大井深
+    if well_index is not None:
+        well_index = np.asarray(well_index)
+        shift = well_index[valid] * (np.abs(md[valid]).max(initial=0) * 2 + 1)  # 每口井重新累计最大值
+        deepest = np.maximum.accumulate(md[valid] + shift)[:-1] - shift[:-1]
+        same = well_index[prev] == well_index[cur]
+        prev, cur, deepest = prev[same], cur[same], deepest[same]
+    delta_md = md[cur] - md[prev]
+    delta_inc = np.abs(inc[cur] - inc[prev])
+    delta_azi = np.abs((azi[cur] - azi[prev] + 180) % 360 - 180)
+
+    duplicate = (delta_md == 0) & (delta_inc == 0) & (delta_azi == 0)
+    flags[cur[duplicate]] |= FLAGS['duplicate']
+    flags[cur[(md[cur] <= deepest) & ~duplicate]] |= FLAGS['md_order']
+    flags[cur[delta_inc > settings['inc_jump']]] |= FLAGS['inc_jump']
+    flags[cur[(delta_azi > settings['azi_jump']) & (inc[cur] + inc[prev] > 0)]] |= FLAGS['azi_jump']  # 垂直段方位无意义
+
+    dogleg = np.degrees(calc_dogleg_array(inc[prev], inc[cur], azi[prev], azi[cur]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dls = dogleg * settings['dls_resolution'] / delta_md
+    flags[cur[(delta_md > 0) & (dls > settings['dls'])]] |= FLAGS['dls']
+    return flags
+
+
+def clean_survey(md, inc, azi, flags=None, drop=DROP, **limits):
+    """
+    按检查结果清洗测斜数据：去掉drop中各项有问题的测点，方位角按360°取模
+    :param flags: survey_flags的结果，默认现算
+    :param drop: 要去掉的检查项
+    :return: (md, inc, azi, flags)，清洗后的数组与原标志数组
+    """
+    md = np.asarray(md, dtype=np.float64)
+    inc = np.asarray(inc, dtype=np.float64)
+    azi = np.asarray(azi, dtype=np.float64)
+    if flags is None:
+        flags = survey_flags(md, inc, azi, **limits)
+    keep = clean_mask(md, flags, drop)
+    return md[keep], inc[keep], np.mod(azi[keep], 360), flags
+
+
+def clean_mask(md, flags, drop=DROP):
+    """
+    清洗时保留的测点，用于与测点一起去掉其他列（如已有坐标）
+    :return: 布尔数组
+    """
+    md = np.asarray(md, dtype=np.float64)
+    keep = ((flags & _mask(drop)) == 0) & ~np.isnan(md)  # 井深缺失的测点无法比较井深，总是去掉
+
+    # 去掉测点后后面的测点可能仍不大于更早测点的井深（如井深回跳），只保留井深严格递增的部分
+    kept = md[keep]
+    increasing = kept > np.maximum.accumulate(np.r_[-np.inf, kept[:-1]])
+    keep[np.flatnonzero(keep)[~increasing]] = False
+    return keep
+
+
+def check_survey_quality(md, inc, azi, reject=DROP, **limits):
+    """
+    检查测斜数据，有reject中各项问题时抛出ValueError
+    :return: 标志数组
+    """
+    flags = survey_flags(md, inc, azi, **limits)
+    bad = (flags & _mask(reject)) != 0
+    if bad.any():
+        raise ValueError('Survey rejected by QC: {} of {} stations flagged ({})'
+                         .format(int(bad.sum()), len(flags), ', '.join(flag_names(np.bitwise_or.reduce(flags[bad])))))
+    return flags
+
+
+def field_flags(field, **limits):
+    """
+    对一个油田的全部测点一次检查
+    :param field: FieldStore
+    :return: 与field.columns等长的标志数组
+    """
+    columns = field.columns
+    return survey_flags(columns['md'], columns['inc'], columns['azi'], well_index=field.well_index, **limits)
+
+
+def flag_frame(flags):
+    """
+    标志数组展开为布尔表，每项检查一列
+    """
+    flags = np.asarray(flags, dtype=np.uint16)
+    return pd.DataFrame({name: (flags & FLAGS[name]) != 0 for name in CHECKS})
+
+
+def flag_names(flags):
+    """
+    一个标志值包含的检查项
+    """
+    return [name for name in CHECKS if int(flags) & int(FLAGS[name])]
+
+
+def _mask(names):
+    mask = np.uint16(0)
+    for name in names:
+        mask |= FLAGS[name]
+    return mask
@@ -0,0 +1,78 @@
+from multiprocessing import shared_memory
+import numpy as np
+from .trajectory import Trajectory, FLOAT_COLUMNS
+from .well import FrozenWell
+
+
+class SharedWell(object):
+    def __init__(self, well, name=None):
+        """
+        将井的轨迹各列与井段/测点类型编码复制到一块共享内存中，供多进程计算共用一份数据。
+        本对象可以pickle传给子进程（只传共享内存块名与井眼信息），子进程调用attach()零拷贝地得到只读的FrozenWell；
+        创建者用完后调用unlink()释放共享内存
+        :param well: Well
+        :param name: 共享内存块名，默认自动生成
+        """
+        trajectory = well.trajectory
+        self.npoints = len(trajectory)
+        self.info = dict(well.info)
+        self.dls_resolution = trajectory.dls_resolution
+        self.version = well.version
+
+        self._shm = shared_memory.SharedMemory(create=True, size=_block_size(self.npoints), name=name)
+        self.name = self._shm.name
+        columns, codes = _block_arrays(self._shm.buf, self.npoints)
+        for row, key in enumerate(FLOAT_COLUMNS):
+            columns[row] = trajectory[key]
+        codes[0] = trajectory.section_codes
+        codes[1] = trajectory.point_codes
+        del columns, codes  # 不保留对共享内存的引用，以便close()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_shm'] = None  # 共享内存句柄不能pickle，子进程按名字重新打开
+        return state
+
+    def attach(self):
+        """
+        以只读方式挂接共享内存中的轨迹，各列直接是共享内存的视图，不复制
+        :return: FrozenWell，共享内存句柄随井保存（well.shared_memory），井被回收前共享内存保持打开
+        """
+        shm = shared_memory.SharedMemory(name=self.name)
+        columns, codes = _block_arrays(shm.buf, self.npoints)
+        trajectory = Trajectory(section_type=codes[0], point_type=codes[1], dls_resolution=self.dls_resolution,
+                                **dict(zip(FLOAT_COLUMNS, columns)))
+        well = FrozenWell({'trajectory': trajectory, 'info': dict(self.info)})
+        well.version = self.version
+        well.shared_memory = shm
+        return well
+
+    def close(self):
+        """
+        关闭创建者的共享内存句柄
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """
+        释放共享内存，所有进程都不再使用后由创建者调用
+        """
+        shm = self._shm or shared_memory.SharedMemory(name=self.name)
+        shm.unlink()
+        shm.close()
+        self._shm = None
+
+
+def _block_size(npoints):
+    return max(npoints * (8 * len(FLOAT_COLUMNS) + 2), 1)
+
+
+def _block_arrays(buffer, npoints):
+    """
+    共享内存块的布局：FLOAT_COLUMNS各列（float64，每行一列）在前，井段类型与测点类型编码（int8）在后
+    """
+    columns = np.ndarray((len(FLOAT_COLUMNS), npoints), dtype=np.float64, buffer=buffer)
+    codes = np.ndarray((2, npoints), dtype=np.int8, buffer=buffer, offset=columns.nbytes)
+    return columns, codes
@@ -0,0 +1,387 @@
+from collections.abc import MutableMapping
+import numpy as np
+import pandas as pd
+
+FLOAT_COLUMNS = ('md', 'inc', 'azi', 'tvd', 'north', 'east', 'dl')  # 连续存储的基本列
+DELTA_KEYS = ('md', 'tvd', 'inc', 'azi', 'dl', 'dls', 'north', 'east')  # 与上一测点的增量
+SECTION_TYPES = ('vertical', 'hold', 'horizontal', 'build-up', 'drop-off')
+POINT_TYPES = ('survey', 'interpolated')
+STATION_KEYS = FLOAT_COLUMNS + ('dls', 'delta', 'sectionType', 'pointType')
+CACHED_PER_STATION = ('dls', 'sectionType', 'pointType')  # 与列等长、可逐测点更新的缓存（另有各参数的增量）
+
+
+class Station(MutableMapping):
+    """
+    轨迹中某一测点的字典式视图，读写直接作用于Trajectory的列，兼容以前字典列表的用法
+    """
+    __slots__ = ('_trajectory', '_idx')
+
+    def __init__(self, trajectory, idx):
+        self._trajectory = trajectory
+        self._idx = idx
+
+    def __getitem__(self, key):
+        trajectory = self._trajectory
+        if key in FLOAT_COLUMNS or key == 'dls':
+            return float(trajectory[key][self._idx])
+        elif key == 'delta':
+            return {param: float(trajectory.delta(param)[self._idx]) for param in DELTA_KEYS}
+        elif key == 'sectionType':
+            return SECTION_TYPES[trajectory.section_codes[self._idx]]
+        elif key == 'pointType':
+            return POINT_TYPES[trajectory.point_codes[self._idx]]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        trajectory = self._trajectory
+        if key in FLOAT_COLUMNS:
+            trajectory.writable(key)[self._idx] = value
+            trajectory._invalidate()
+        elif key in ('sectionType', 'pointType'):
+            trajectory.set_code(key, self._idx, value)
+        else:
+            raise KeyError('"{}" is derived from the trajectory columns and can not be set'.format(key))
+
+    def __delitem__(self, key):
+        raise TypeError('Station keys can not be deleted')
+
+    def __iter__(self):
+        return iter(STATION_KEYS)
+
+    def __len__(self):
+        return len(STATION_KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Trajectory(object):
+    def __init__(self, md, inc, azi, tvd, north, east, dl, section_type=None, point_type=None, dls_resolution=30):
+        """
+        列式存储的井眼轨迹，每个参数为一列连续的float64数组；
+        狗腿严重度、增量与井段类型在第一次访问时才计算，并按列缓存
+        :param md, inc, azi, tvd, north, east, dl: 各测点的井深、井斜角、方位角、垂深、北坐标、东坐标、狗腿角(°)
+        :param section_type: 井段类型的列表（字符串）或编码数组，默认由井斜角与垂深判断
+        :param point_type: 测点类型的列表（字符串）或编码数组，默认全部为'survey'
+        :param dls_resolution: 狗腿严重度的分辨率
+        """
+        self._columns = {}
+        for name, values in zip(FLOAT_COLUMNS, (md, inc, azi, tvd, north, east, dl)):
+            self._columns[name] = np.ascontiguousarray(values, dtype=np.float64)  # 已是float64数组时不复制
+        self._section = _encode(section_type, SECTION_TYPES)
+        self._point = _encode(point_type, POINT_TYPES)
+        self.dls_resolution = dls_resolution
+        self._buffers = {}  # 追加测点用的容量缓冲区，列为其前len(self)个元素的视图
+        self._shared = set()  # 与只读快照共享的数组（列名、'sectionType'、'pointType'、'cache_'加缓存名），修改前先复制
+        self._readonly = False
+        self._cache = {}
+        self.version = 0  # 轨迹每改变一次加一，见_invalidate
+
+    @classmethod
+    def from_records(cls, records, dls_resolution=30):
+        """
+        由字典的列表（以前的轨迹格式）构造
+        """
+        columns = {name: [point[name] for point in records] for name in FLOAT_COLUMNS}
+        section_type = [point.get('sectionType', 'vertical') for point in records]
+        point_type = [point.get('pointType', 'survey') for point in records]
+        return cls(section_type=section_type, point_type=point_type, dls_resolution=dls_resolution, **columns)
+
+    def _invalidate(self):
+        """
+        轨迹改变后，由列计算出的结果（狗腿严重度、增量、索引等）全部失效，版本加一
+        """
+        self._cache = {}
+        self.version += 1
+
+    def __len__(self):
+        return len(self._columns['md'])
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield Station(self, idx)
+
+    def __getitem__(self, key):
+        """
+        trajectory['md'] 返回整列数组（不复制）；trajectory[idx] 返回该测点的字典式视图
+        """
+        if isinstance(key, str):
+            if key in self._columns:
+                return self._columns[key]
+            elif key == 'dls':
+                return self.cached('dls', _calc_dls)
+            elif key == 'sectionType':
+                return np.array(SECTION_TYPES, dtype=object)[self.section_codes]
+            elif key == 'pointType':
+                return np.array(POINT_TYPES, dtype=object)[self.point_codes]
+            raise KeyError(key)
+        if isinstance(key, slice):
+            return [Station(self, idx) for idx in range(len(self))[key]]
+        idx = range(len(self))[key]  # 支持负索引，越界时抛出IndexError
+        return Station(self, idx)
+
+    @property
+    def section_codes(self):
+        """
+        井段类型编码数组（SECTION_TYPES的索引）
+        """
+        if self._section is not None:
+            return self._section
+        return self.cached('sectionType', lambda t: define_sections(t['inc'], t['tvd']))
+
+    @property
+    def point_codes(self):
+        """
+        测点类型编码数组（POINT_TYPES的索引）
+        """
+        if self._point is not None:
+            return self._point
+        return self.cached('pointType', lambda t: np.zeros(len(t), dtype=np.int8))
+
+    def set_code(self, key, idx, value):
+        """
+        设置某测点的井段类型或测点类型，设置后该列不再由轨迹推导
+        """
+        self._check_writable()
+        if key == 'sectionType':
+            self._section = self.section_codes.copy()
+            self._section[idx] = SECTION_TYPES.index(value)
+        else:
+            self._point = self.point_codes.copy()
+            self._point[idx] = POINT_TYPES.index(value)
+        self._invalidate()
+
+    def writable(self, name):
+        """
+        可原地修改的列，与快照共享的只读列先复制一份（写时复制）
+        """
+        self._check_writable()
+        values = self._columns[name] = self._own(name, self._columns[name])
+        return values
+
+    def freeze(self):
+        """
+        只读快照：与本轨迹共享各列与缓存，不复制数据。只有快照的数组（视图）是只读的，本轨迹的数组仍可写，
+        之后经writable、refresh、extend修改某个共享数组时先复制该数组（写时复制）；
+        直接对trajectory['inc']等返回的数组原地赋值不经过写时复制，会同时改变快照
+        :return: 不能修改的Trajectory
+        """
+        if self._readonly:
+            return self
+        columns = {name: _read_only(values) for name, values in self._columns.items()}
+        section, point = (None if codes is None else _read_only(codes) for codes in (self._section, self._point))
+        cache = {name: _read_only(v) if isinstance(v, np.ndarray) else v for name, v in self._cache.items()}
+        self._shared.update(self._columns)
+        self._shared.update(key for key, codes in (('sectionType', section), ('pointType', point)) if codes is not None)
+        self._shared.update('cache_' + name for name, v in self._cache.items() if isinstance(v, np.ndarray))
+        self._buffers = {}  # 追加测点时不再写入与快照共享的缓冲区
+
+        snapshot = Trajectory(section_type=section, point_type=point, dls_resolution=self.dls_resolution, **columns)
+        snapshot._cache = cache
+        snapshot._readonly = True
+        snapshot.version = self.version
+        return snapshot
+
+    def _check_writable(self):
+        if self._readonly:
+            raise TypeError('Trajectory snapshot is read-only')
+
+    def cached(self, name, func):
+        """
+        由列计算出的结果（如垂深索引）的缓存，轨迹改变后自动失效
+        :param name: 缓存名
+        :param func: 缓存不存在时调用func(trajectory)计算
+        """
+        if name not in self._cache:
+            self._cache[name] = func(self)
+        return self._cache[name]
+
+    def locate(self, md):
+        """
+        二分查找井深所在位置
+        :param md: 井深
+        :return: (idx, exact)，exact为True时idx为重合测点的索引，否则井深位于测点idx - 1与idx之间
+        """
+        md_col = self._columns['md']
+        if md < 0:
+            raise ValueError('MD value must be positive')
+        if not md >= md_col[0]:  # 轨迹可能不从井口开始（如FieldStore按井深截取的井段），NaN也在此拒绝
+            raise ValueError("MD can't be shallower than shallowest trajectory MD")
+        if md > md_col[-1]:
+            raise ValueError("MD can't be deeper than deepest trajectory MD")
+        idx = int(np.searchsorted(md_col, md, side='left'))
+        return idx, bool(md_col[idx] == md)
+
+    def delta(self, param):
+        """
+        某参数相对上一测点的增量数组
+        """
+        return self.cached('delta_' + param, lambda t: _calc_delta(t[param]))
+
+    def insert(self, idx, point):
+        """
+        在idx处插入一个测点（字典）
+        """
+        self._check_writable()
+        section = np.insert(self.section_codes, idx, SECTION_TYPES.index(point.get('sectionType', 'vertical')))
+        point_type = np.insert(self.point_codes, idx, POINT_TYPES.index(point.get('pointType', 'interpolated')))
+        for name in FLOAT_COLUMNS:
+            self._columns[name] = np.insert(self._columns[name], idx, point[name])
+        self._section, self._point = section, point_type
+        self._shared.clear()  # 各列都是新数组，缓存也失效
+        self._invalidate()
+
+    def extend(self, columns):
+        """
+        在末尾追加测点，列的容量成倍增长，追加为均摊O(1)；
+        已缓存的狗腿严重度、增量与井段类型只计算新增部分，其余缓存失效
+        :param columns: 字典，包含FLOAT_COLUMNS各列新增测点的数组
+        """
+        self._check_writable()
+        n = len(self)
+        size = n + len(columns['md'])
+        for name in FLOAT_COLUMNS:
+            self._columns[name] = self._grow(name, self._columns[name], size)
+            self._columns[name][n:] = columns[name]
+        if self._section is not None:
+            self._section = self._grow('sectionType', self._section, size)
+        if self._point is not None:
+            self._point = self._grow('pointType', self._point, size)
+            self._point[n:] = POINT_TYPES.index('survey')
+
+        cache = {}
+        for name, values in self._cache.items():
+            if name in CACHED_PER_STATION or name.startswith('delta_'):
+                cache[name] = self._grow('cache_' + name, values, size)
+        if 'pointType' in cache:
+            cache['pointType'][n:] = POINT_TYPES.index('survey')
+        self.refresh(n, size, cache)
+
+    def refresh(self, start, stop, cache=None):
+        """
+        列在[start, stop)处被原地修改后调用：狗腿严重度、增量与井段类型只重新计算这些位置
+        （增量与井段类型还取决于上一测点，stop处也重新计算），其余缓存失效
+        :param cache: 与列等长的逐测点缓存，默认为当前缓存
+        """
+        self._check_writable()
+        cache = self._cache if cache is None else cache
+        self._invalidate()
+        md, inc, tvd = self['md'], self['inc'], self['tvd']
+        lo = max(start, 1)  # 第一个测点没有上一测点，增量为0，井段为'vertical'
+        hi = min(stop + 1, len(self))
+        if self._section is not None:
+            self._section = self._own('sectionType', self._section)
+            self._section[start:lo] = 0
+            self._section[lo:hi] = define_sections(inc[lo - 1:hi], tvd[lo - 1:hi])[1:]
+
+        for name in sorted(cache, key=lambda key: key != 'dls'):  # 增量可能用到dls，先更新dls
+            values = self._own('cache_' + name, cache[name])
+            if name == 'pointType':
+                pass
+            elif name == 'dls':
+                values[start:lo] = 0
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    values[lo:stop] = self['dl'][lo:stop] * self.dls_resolution / (md[lo:stop] - md[lo - 1:stop - 1])
+            elif name.startswith('delta_'):
+                column = self[name[len('delta_'):]]
+                values[start:lo] = 0
+                values[lo:hi] = column[lo:hi] - column[lo - 1:hi - 1]
+            elif name == 'sectionType':
+                values[start:lo] = 0
+                values[lo:hi] = define_sections(inc[lo - 1:hi], tvd[lo - 1:hi])[1:]
+            else:  # 其他缓存（如垂深索引）下次访问时重新计算
+                continue
+            self._cache[name] = values
+
+    def _grow(self, name, values, size):
+        """
+        将values扩展为size长：values是容量缓冲区的视图且容量足够时直接取更长的视图，否则容量成倍扩大
+        """
+        buffer = self._buffers.get(name)
+        if buffer is None or values.base is not buffer or len(buffer) < size:
+            buffer = np.empty(max(size, 2 * len(values), 16), dtype=values.dtype)
+            buffer[:len(values)] = values
+            self._buffers[name] = buffer
+            self._shared.discard(name)
+        return buffer[:size]
+
+    def _own(self, name, values):
+        """
+        可原地修改的数组：与快照共享或只读时复制一份
+        :param name: 数组名，同_shared
+        """
+        if name in self._shared or not values.flags.writeable:
+            self._shared.discard(name)
+            return values.copy()
+        return values
+
+    def copy(self):
+        section = None if self._section is None else self._section.copy()
+        point_type = None if self._point is None else self._point.copy()
+        return Trajectory(section_type=section, point_type=point_type, dls_resolution=self.dls_resolution,
+                          **{name: values.copy() for name, values in self._columns.items()})
+
+    def to_frame(self):
+        """
+        转为DataFrame，每列一个参数
+        """
+        data = dict(self._columns)
+        data['dls'] = self['dls']
+        data['sectionType'] = self['sectionType']
+        data['pointType'] = self['pointType']
+        return pd.DataFrame(data)
+
+
+def define_sections(inc, tvd):
+    """
+    向量化的井段分类，规则与well.define_section相同
+    :param inc: 井斜角数组, °
+    :param tvd: 垂深数组
+    :return: 井段类型编码数组（SECTION_TYPES的索引）
+    """
+    inc = np.asarray(inc, dtype=np.float64)
+    tvd = np.asarray(tvd, dtype=np.float64)
+    codes = np.zeros(len(inc), dtype=np.int8)
+    inc1, inc2 = inc[:-1], inc[1:]
+
+    same = np.round(inc1, 2) == np.round(inc2, 2)
+    flat = np.trunc(tvd[1:] - tvd[:-1]) == 0  # 垂深变化不足1（向0取整）
+    section = np.where(inc2 > inc1, SECTION_TYPES.index('build-up'), SECTION_TYPES.index('drop-off'))
+    section = np.where(same, np.where(flat, SECTION_TYPES.index('horizontal'), SECTION_TYPES.index('hold')), section)
+    section = np.where((inc1 == 0) & (inc2 == 0), SECTION_TYPES.index('vertical'), section)
+    codes[1:] = section
+    return codes
+
+
+def _read_only(values):
+    """
+    数组的只读视图，不复制数据，原数组仍可写
+    """
+    view = values.view()
+    view.setflags(write=False)
+    return view
+
+
+def _calc_delta(values):
+    delta = np.zeros_like(values)
+    delta[1:] = values[1:] - values[:-1]
+    return delta
+
+
+def _calc_dls(trajectory):
+    dls = np.zeros_like(trajectory['dl'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dls[1:] = trajectory['dl'][1:] * trajectory.dls_resolution / trajectory.delta('md')[1:]
+    return dls
+
+
+def _encode(values, names):
+    """
+    将字符串类型的列编码为int8数组
+    """
+    if values is None:
+        return None
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        return values.astype(np.int8, copy=False)
+    lookup = {name: code for code, name in enumerate(names)}
+    return np.array([lookup[value] for value in values], dtype=np.int8)
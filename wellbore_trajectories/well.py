@@ -1,24 +1,56 @@
 from .equations import *
+import numpy as np
 from .plot import plot_wellpath, plot_top_view, plot_vs
-import pandas as pd
+from .trajectory import Trajectory
+from .min_curvature import merge_points, interp_segments, md_at_tvd, min_curvature
+from .trajectory import DELTA_KEYS
+from .geo import well_coordinates
+from .analytics import dls_analytics
 
 
 class Well(object):
     def __init__(self, data):
         self.info = data['info']
-        self.trajectory = data['trajectory']
-        for idx, point in enumerate(self.trajectory):
-            if idx > 0:
-                delta_md = point['md'] - self.trajectory[idx - 1]['md']
-                point['dls'] = calc_dls(point, delta_md, resolution=self.info['dlsResolution'])
-                point['delta'] = get_delta(point, self.trajectory[idx - 1])
-            else:
-                point['dls'] = 0
-                point['delta'] = get_delta(point)
-        self.npoints = len(self.trajectory)
+        trajectory = data['trajectory']
+        if not isinstance(trajectory, Trajectory):  # 字典的列表转为列式存储
+            trajectory = Trajectory.from_records(trajectory, dls_resolution=self.info['dlsResolution'])
+        self.trajectory = trajectory
+        self.version = 0
+
+    @property
+    def npoints(self):
+        return len(self.trajectory)
+
+    @property
+    def version(self):
+        """
+        轨迹每改变一次加一，依赖轨迹的计算（如摩阻扭矩）据此判断是否过期；
+        由Trajectory.version计数，经测点赋值、旧接口插点等途径的修改也都计入
+        """
+        return self._version + self.trajectory.version
+
+    @version.setter
+    def version(self, value):
+        self._version = value - self.trajectory.version
+
+    @property
+    def _base_data(self):
+        """
+        读入的原始数据（DataFrame）；从缓存读取的井只记下读取函数，第一次访问时才读原文件
+        """
+        if '_base_table' not in self.__dict__:
+            if '_base_reader' not in self.__dict__:
+                raise AttributeError("'{}' object has no attribute '_base_data'".format(type(self).__name__))
+            self._base_table = self._base_reader()
+        return self._base_table
+
+    @_base_data.setter
+    def _base_data(self, value):
+        self._base_table = value
 
     def plot(self, **kwargs):
-        default = {'plot_type': '3d', 'add_well': None, 'names': None, 'style': None, 'y_axis': 'md', 'x_axis': 'inc'}
+        default = {'plot_type': '3d', 'add_well': None, 'names': None, 'style': None, 'y_axis': 'md', 'x_axis': 'inc',
+                   'geographic': False}
         for key, value in kwargs.items():
             default[key] = value
 
@@ -26,7 +58,8 @@ class Well(object):
             fig = plot_wellpath(self, add_well=default['add_well'], names=default['names'], style=default['style'])
             return fig
         elif default['plot_type'] == 'top':
-            fig = plot_top_view(self, add_well=default['add_well'], names=default['names'], style=default['style'])
+            fig = plot_top_view(self, add_well=default['add_well'], names=default['names'], style=default['style'],
+                                geographic=default['geographic'])
             return fig
         elif default['plot_type'] == 'vs':
             fig = plot_vs(self, y_axis=default['y_axis'], x_axis=default['x_axis'], add_well=default['add_well'],
@@ -36,15 +69,113 @@ class Well(object):
             raise ValueError('The plot type "{}" is not recognised'.format(default['plot_type']))
 
     def df(self):
-        dataframe = pd.DataFrame(self.trajectory)
+        dataframe = self.trajectory.to_frame()
         return dataframe
 
+    def resample(self, step=None, n_per_segment=None, keep_stations=True):
+        """
+        轨迹加密，所有测段一次批量插值，返回新的Well，原轨迹不变
+        :param step: 按固定井深间隔插值，井深网格从井口开始
+        :param n_per_segment: 每一测段内均匀插入的点数
+        :param keep_stations: 为False时只保留井深网格上的点（以及井口、井底），落在网格上的测点仍保留，仅对step有效
+        :return: 加密后的Well
+        """
+        md = self.trajectory['md']
+        if step is not None:
+            md_new = np.arange(md[0], md[-1], step)
+        elif n_per_segment is not None:
+            frac = np.arange(1, n_per_segment + 1) / (n_per_segment + 1)
+            md_new = (md[:-1, None] + (md[1:] - md[:-1])[:, None] * frac).ravel()
+            keep_stations = True
+        else:
+            raise ValueError('Either step or n_per_segment must be given')
+
+        trajectory = merge_points(self.trajectory, md_new, keep_stations=keep_stations)
+        return Well({'trajectory': trajectory, 'info': dict(self.info)})
+
+    def append_survey(self, md, inc, azi):
+        """
+        随钻追加一个测点，只计算新测段
+        :param md: 井深，需大于当前井底井深
+        :param inc: 井斜角, °
+        :param azi: 方位角, °
+        """
+        self.append_surveys([md], [inc], [azi])
+
+    def append_surveys(self, md, inc, azi):
+        """
+        批量追加测点，最小曲率法只计算新增的测段，由井底测点接续，追加为均摊O(1)
+        :param md: 井深数组，需递增且大于当前井底井深
+        :param inc: 井斜角数组, °
+        :param azi: 方位角数组, °
+        """
+        trajectory = self.trajectory
+        md = np.atleast_1d(np.asarray(md, dtype=np.float64))
+        inc = np.atleast_1d(np.asarray(inc, dtype=np.float64))
+        azi = np.atleast_1d(np.asarray(azi, dtype=np.float64))
+        if not md.size:
+            return
+        last = {key: trajectory[key][-1] for key in ('md', 'inc', 'azi', 'tvd', 'north', 'east')}
+        if md[0] <= last['md'] or (np.diff(md) <= 0).any():
+            raise ValueError('Survey MD must increase beyond the deepest trajectory MD')
+
+        coords = min_curvature(np.concatenate(([last['md']], md)), np.concatenate(([last['inc']], inc)),
+                               np.concatenate(([last['azi']], azi)),
+                               north=last['north'], east=last['east'], tvd=last['tvd'])
+        columns = {key: values[1:] for key, values in coords.items()}
+        columns.update(md=md, inc=inc, azi=azi)
+        trajectory.extend(columns)
+
+    def update_station(self, idx, inc=None, azi=None):
+        """
+        修改一个测点的井斜角或方位角（如质量检查后的校正），只重新计算相邻两个测段，
+        下方各测点的坐标整体平移同一个偏移量
+        :param idx: 测点索引
+        :param inc: 新的井斜角, °，None时不变
+        :param azi: 新的方位角, °，None时不变
+        """
+        trajectory = self.trajectory
+        n = len(trajectory)
+        idx = range(n)[idx]
+        if inc is not None:
+            trajectory.writable('inc')[idx] = inc
+        if azi is not None:
+            trajectory.writable('azi')[idx] = azi
+
+        lo, hi = max(idx - 1, 0), min(idx + 2, n)  # 相邻两个测段的上、下测点
+        coords = min_curvature(trajectory['md'][lo:hi], trajectory['inc'][lo:hi], trajectory['azi'][lo:hi],
+                               north=trajectory['north'][lo], east=trajectory['east'][lo], tvd=trajectory['tvd'][lo])
+        trajectory.writable('dl')[lo + 1:hi] = coords['dl'][1:]
+        for key in ('north', 'east', 'tvd'):
+            column = trajectory.writable(key)
+            offset = coords[key][-1] - column[hi - 1]
+            column[lo + 1:hi - 1] = coords[key][1:-1]
+            column[hi - 1:] += offset  # 下方测点整体平移
+        trajectory.refresh(lo + 1, hi)
+
+    def freeze(self):
+        """
+        只读快照，与本井共享轨迹数组（写时复制），可在线程与多个计算之间共享而不必深拷贝
+        :return: FrozenWell
+        """
+        well = FrozenWell({'trajectory': self.trajectory, 'info': dict(self.info)})
+        well.version = self.version
+        return well
+
     def add_location(self, lat, lon):
         """
         设置经纬度
         """
         self.info['location'] = {'lat': lat, 'lon': lon}
 
+    def geo_coordinates(self, crs=None):
+        """
+        各测点的经纬度或投影坐标，需先用add_location设置井口经纬度；按井口位置与坐标系缓存
+        :param crs: None时为经纬度，否则为投影坐标系（如'EPSG:32650'，需要pyproj）
+        :return: 字典，{'lat', 'lon'}或{'x', 'y'}数组
+        """
+        return well_coordinates(self, crs)
+
     def get_point(self, depth, depth_type='md'):
         """
         得到给定深度处的井的全部信息
@@ -61,6 +192,69 @@ class Well(object):
         else:
             raise ValueError(depth_type, ' is not a valid value for depth_type')
 
+    def analytics(self, window=30.0, threshold=None):
+        """
+        狗腿严重度统计：滑动窗口最大值与平均值、累计狗腿角、弯曲度指数与狗腿集中段，见analytics.dls_analytics
+        :param window: 窗口长度（井深）
+        :param threshold: 狗腿严重度阈值，超过的连续井段记为狗腿集中段
+        :return: 字典，各参数为与测点等长的数组，hot_spots为列表
+        """
+        trajectory = self.trajectory
+        return dls_analytics(trajectory['md'], trajectory['dl'], trajectory.dls_resolution, window, threshold)
+
+    def md_at_tvd(self, tvd):
+        """
+        批量求给定垂深首次到达处的井深
+        :param tvd: 垂深数组
+        :return: 井深数组
+        """
+        return md_at_tvd(self.trajectory, tvd)
+
+    def get_points(self, md):
+        """
+        批量得到一组井深处的井的全部信息，不改变轨迹
+        :param md: 井深数组
+        :return: 字典，各参数为与md等长的数组；dl、dls与delta相对于所在测段的上测点，与get_point相同，
+                 井深与测点重合时取该测点的值
+        """
+        trajectory = self.trajectory
+        md_col = trajectory['md']
+        md = np.asarray(md, dtype=np.float64)
+        if (md < 0).any():
+            raise ValueError('MD value must be positive')
+        if not (md >= md_col[0]).all():  # 与Trajectory.locate相同，NaN也在此拒绝
+            raise ValueError("MD can't be shallower than shallowest trajectory MD")
+        if (md > md_col[-1]).any():
+            raise ValueError("MD can't be deeper than deepest trajectory MD")
+
+        points = interp_segments(trajectory, md)
+        upper = points.pop('segment')
+        del points['cdl']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            points['dls'] = points['dl'] * trajectory.dls_resolution / (md - md_col[upper])
+
+        idx = np.minimum(np.searchsorted(md_col, md, side='left'), len(md_col) - 1)
+        exact = md_col[idx] == md  # 与测点重合
+        for key in ('dl', 'dls'):
+            points[key] = np.where(exact, trajectory[key][idx], points[key])
+        points['delta'] = {}
+        for param in DELTA_KEYS:
+            delta = points[param] - trajectory[param][upper]
+            points['delta'][param] = np.where(exact, trajectory.delta(param)[idx], delta)
+        return points
+
+    def insert_points(self, md):
+        """
+        批量插入一组井深处的插值点（改变轨迹），一次排序合并，被插入测段的狗腿角相应拆分
+        :param md: 井深数组，与已有测点重合的忽略
+        :return: md中各井深在新轨迹中的索引
+        """
+        md = np.asarray(md, dtype=np.float64)
+        version = self.version
+        self.trajectory = merge_points(self.trajectory, md)
+        self.version = version + 1  # 新轨迹的版本从0开始，接续原来的版本
+        return np.searchsorted(self.trajectory['md'], md)
+
     def interp_any_point(self, depth, depth_type='md'):
         """
         任意一点插值，注意改变后端测点的信息，为摩阻计算做准备
@@ -69,11 +263,9 @@ class Well(object):
         :return:
         """
         if depth_type == 'md':
-            self.npoints += 1
             return interp_pt_any(depth, self.trajectory)
 
         elif depth_type == 'tvd':
-            self.npoints += 1
             return scan_tvd_any(depth, self.trajectory)
         else:
             raise ValueError(depth_type, ' is not a valid value for depth_type')
@@ -86,16 +278,46 @@ class Well(object):
         :return:
         """
         if depth_type == 'md':
-            self.npoints += 1
             return get_pt_any(depth, self.trajectory)
 
         elif depth_type == 'tvd':
-            self.npoints += 1
             return get_tvd_any(depth, self.trajectory)
         else:
             raise ValueError(depth_type, ' is not a valid value for depth_type')
 
 
+class FrozenWell(Well):
+    """
+    Well的只读快照，轨迹不能原地修改；插入点返回新的快照，原快照不变
+    """
+    def __init__(self, data):
+        super().__init__(data)
+        self.trajectory = self.trajectory.freeze()
+
+    def freeze(self):
+        return self
+
+    def with_points(self, md):
+        """
+        插入一组井深处的插值点，新轨迹的各列由merge_points一次合并排序得到，是新分配的数组（比深拷贝整口井省，
+        但不与原快照共用列）；md全部是已有测点时不复制
+        :param md: 井深数组，与已有测点重合的忽略
+        :return: 新的FrozenWell，md全部是已有测点时返回自身，井眼信息与原快照共用
+        """
+        md = np.asarray(md, dtype=np.float64)
+        if np.isin(md, self.trajectory['md']).all():
+            return self
+        well = FrozenWell({'trajectory': merge_points(self.trajectory, md), 'info': self.info})
+        well.version = self.version
+        return well
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('FrozenWell is read-only, use with_points to get a snapshot with inserted points')
+
+    insert_points = append_survey = append_surveys = update_station = add_location = _read_only
+    interp_any_point = get_any_point = _read_only  # 旧接口，会在轨迹中插入点
+
+
 def define_section(p2, p1=None):
 
     if not p1: